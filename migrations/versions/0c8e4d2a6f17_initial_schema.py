@@ -0,0 +1,78 @@
+"""venues, artists and shows
+
+Revision ID: 0c8e4d2a6f17
+Revises:
+Create Date: 2026-10-18 09:48:03.127560
+
+The schema the later revisions start from. Tables that already exist, in
+databases set up before the migrations were kept in the repository, are
+left as they are.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c8e4d2a6f17'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = existing_tables()
+    if 'venues' not in existing:
+        op.create_table(
+            'venues',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('state', sa.String(length=120), nullable=True),
+            sa.Column('address', sa.String(length=120), nullable=True),
+            sa.Column('phone', sa.String(length=120), nullable=True),
+            sa.Column('genres', sa.String(length=120), nullable=True),
+            sa.Column('facebook_link', sa.String(length=120), nullable=True),
+            sa.Column('image_link', sa.String(length=500), nullable=True),
+            sa.Column('website', sa.String(length=120), nullable=True),
+            sa.Column('seeking_talent', sa.Boolean(), nullable=True),
+            sa.Column('seeking_description', sa.String(length=120), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'artists' not in existing:
+        op.create_table(
+            'artists',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('state', sa.String(length=120), nullable=True),
+            sa.Column('phone', sa.String(length=120), nullable=True),
+            sa.Column('genres', sa.String(length=120), nullable=True),
+            sa.Column('facebook_link', sa.String(length=120), nullable=True),
+            sa.Column('image_link', sa.String(length=500), nullable=True),
+            sa.Column('website', sa.String(length=120), nullable=True),
+            sa.Column('seeking_venue', sa.Boolean(), nullable=True),
+            sa.Column('seeking_description', sa.String(length=120), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'shows' not in existing:
+        op.create_table(
+            'shows',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('artist_id', sa.Integer(), nullable=False),
+            sa.Column('venue_id', sa.Integer(), nullable=False),
+            sa.Column('start_time', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ),
+            sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('shows')
+    op.drop_table('artists')
+    op.drop_table('venues')
@@ -0,0 +1,74 @@
+"""search vectors for venues and artists
+
+Revision ID: 4f1a2c6d9e10
+Revises: 0c8e4d2a6f17
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1a2c6d9e10'
+down_revision = '0c8e4d2a6f17'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists')
+
+
+def upgrade():
+    # IF NOT EXISTS throughout: search.py creates the same objects along
+    # with the tables when they come from db.create_all().
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in TABLES:
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                "GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(city, '')), 'B') || "
+                "setweight(to_tsvector('simple', coalesce(genres, '')), 'C')) STORED"
+            )
+            op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)')
+            op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm ON {table} USING GIN (name gin_trgm_ops)')
+
+    elif op.get_bind().dialect.name == 'sqlite':
+        for table in TABLES:
+            op.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+                f"name, city, genres, content='{table}', content_rowid='id')"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {table}_fts(rowid, name, city, genres) "
+                "VALUES (new.id, new.name, new.city, new.genres); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, name, city, genres) "
+                "VALUES ('delete', old.id, old.name, old.city, old.genres); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, name, city, genres) "
+                "VALUES ('delete', old.id, old.name, old.city, old.genres); "
+                f"INSERT INTO {table}_fts(rowid, name, city, genres) "
+                "VALUES (new.id, new.name, new.city, new.genres); END"
+            )
+            # index the rows that already exist
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_name_trgm')
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search_vector')
+            op.drop_column(table, 'search_vector')
+
+    elif op.get_bind().dialect.name == 'sqlite':
+        for table in TABLES:
+            for action in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{action}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
@@ -0,0 +1,37 @@
+"""indexes for show lookups and listings
+
+Revision ID: 7b3e91d0c2a4
+Revises: 4f1a2c6d9e10
+Create Date: 2026-10-18 11:02:15.904417
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e91d0c2a4'
+down_revision = '4f1a2c6d9e10'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time']),
+    ('ix_venues_state_city', 'venues', ['state', 'city', 'id']),
+    ('ix_artists_name', 'artists', ['name']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so
+    # Postgres builds each index in its own autocommit block and keeps
+    # writes to the tables flowing meanwhile.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,46 @@
+"""denormalized show counters on venues and artists
+
+Revision ID: 9c5d2e7f4b18
+Revises: 7b3e91d0c2a4
+Create Date: 2026-10-18 12:20:47.551093
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5d2e7f4b18'
+down_revision = '7b3e91d0c2a4'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('venues', 'venue_id'), ('artists', 'artist_id'))
+
+
+def upgrade():
+    # the app compares naive local times, CURRENT_TIMESTAMP is UTC on SQLite
+    now = sa.bindparam('now', datetime.now(), type_=sa.DateTime())
+    for table, owner in OWNERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_time', sa.DateTime(), nullable=True))
+        op.create_index(f'ix_{table}_next_show_time', table, ['next_show_time'])
+
+        # backfill from the existing shows
+        op.execute(sa.text(
+            f"UPDATE {table} SET "
+            f"upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time > :now), "
+            f"past_shows_count = (SELECT count(*) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time <= :now), "
+            f"next_show_time = (SELECT min(start_time) FROM shows WHERE shows.{owner} = {table}.id AND shows.start_time > :now)"
+        ).bindparams(now))
+
+
+def downgrade():
+    for table, owner in OWNERS:
+        op.drop_index(f'ix_{table}_next_show_time', table_name=table)
+        op.drop_column(table, 'next_show_time')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
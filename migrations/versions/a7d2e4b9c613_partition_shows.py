@@ -0,0 +1,143 @@
+"""monthly partitions of shows (opt-in)
+
+Revision ID: a7d2e4b9c613
+Revises: f3c6a0d8b5e4
+Create Date: 2026-10-18 23:12:40.502917
+
+Postgres only, and only when asked for:
+
+    flask db upgrade -x partition_shows=true
+
+or with FYYUR_PARTITION_SHOWS=true in the environment. Without it the
+revision is recorded and nothing changes; it can be applied later by
+downgrading to f3c6a0d8b5e4 and upgrading again with the flag.
+
+"""
+import os
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e4b9c613'
+down_revision = 'f3c6a0d8b5e4'
+branch_labels = None
+depends_on = None
+
+# months of empty partitions created ahead of today
+MONTHS_AHEAD = 12
+
+INDEXES = (
+    ('ix_shows_venue_id_start_time', 'venue_id, start_time'),
+    ('ix_shows_artist_id_start_time', 'artist_id, start_time'),
+    ('ix_shows_start_time_id', 'start_time, id'),
+)
+
+# same as database/partitions.py
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION fyyur_create_show_partition(month date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+    first_day date := date_trunc('month', month)::date;
+    next_first_day date := (date_trunc('month', month) + interval '1 month')::date;
+    name text := 'shows_' || to_char(first_day, 'YYYY_MM');
+BEGIN
+    IF to_regclass(name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE shows INCLUDING DEFAULTS)', name);
+    -- shows of that month that went to the default partition move over
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM shows_default WHERE start_time >= %L AND start_time < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved', first_day, next_first_day, name);
+    -- lets ATTACH skip scanning the new table
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (start_time >= %L AND start_time < %L)',
+                   name, name || '_range', first_day, next_first_day);
+    EXECUTE format('ALTER TABLE shows ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   name, first_day, next_first_day);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', name, name || '_range');
+    RETURN true;
+END $$
+"""
+
+
+def requested():
+    value = os.environ.get('FYYUR_PARTITION_SHOWS') or context.get_x_argument(
+        as_dictionary=True).get('partition_shows', '')
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def is_partitioned():
+    return op.get_bind().execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('shows'))"
+    )).scalar()
+
+
+def set_aside(old):
+    # Keep the old table under another name until its rows are copied.
+    op.execute(f'ALTER TABLE shows RENAME TO {old}')
+    op.execute(f'ALTER TABLE {old} RENAME CONSTRAINT shows_pkey TO {old}_pkey')
+    for name, columns in INDEXES:
+        op.execute(f'ALTER INDEX IF EXISTS {name} RENAME TO {name.replace("shows", old)}')
+
+
+def create_indexes():
+    for name, columns in INDEXES:
+        op.execute(f'CREATE INDEX {name} ON shows ({columns})')
+
+
+def copy_rows(old):
+    op.execute(f'INSERT INTO shows (id, artist_id, venue_id, start_time) '
+               f'SELECT id, artist_id, venue_id, start_time FROM {old}')
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.execute(f'DROP TABLE {old}')
+    op.execute('ANALYZE shows')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql' or not requested() or is_partitioned():
+        return
+
+    set_aside('shows_unpartitioned')
+    # The partition key has to be part of the primary key.
+    op.execute(
+        "CREATE TABLE shows ("
+        "id integer NOT NULL DEFAULT nextval('shows_id_seq'), "
+        "artist_id integer NOT NULL REFERENCES artists (id), "
+        "venue_id integer NOT NULL REFERENCES venues (id), "
+        "start_time timestamp without time zone NOT NULL, "
+        "PRIMARY KEY (id, start_time)"
+        ") PARTITION BY RANGE (start_time)"
+    )
+    op.execute('CREATE TABLE shows_default PARTITION OF shows DEFAULT')
+    op.execute(CREATE_PARTITION_FUNCTION)
+    # One partition per month from the first show to MONTHS_AHEAD ahead,
+    # created while they are still empty.
+    op.execute(
+        "SELECT fyyur_create_show_partition(month::date) FROM generate_series("
+        "date_trunc('month', coalesce((SELECT min(start_time) FROM shows_unpartitioned), now())), "
+        f"date_trunc('month', now()) + interval '{MONTHS_AHEAD} months', "
+        "interval '1 month') AS month"
+    )
+    create_indexes()
+    copy_rows('shows_unpartitioned')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql' or not is_partitioned():
+        return
+
+    set_aside('shows_partitioned')
+    op.execute(
+        "CREATE TABLE shows ("
+        "id integer NOT NULL DEFAULT nextval('shows_id_seq') PRIMARY KEY, "
+        "artist_id integer NOT NULL REFERENCES artists (id), "
+        "venue_id integer NOT NULL REFERENCES venues (id), "
+        "start_time timestamp without time zone NOT NULL"
+        ")"
+    )
+    create_indexes()
+    # Detached (archived) months stay behind as plain tables.
+    copy_rows('shows_partitioned')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_create_show_partition(date)')
@@ -0,0 +1,101 @@
+"""genres as indexed arrays
+
+Revision ID: b2f64a8e1d53
+Revises: 9c5d2e7f4b18
+Create Date: 2026-10-18 13:41:09.226175
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f64a8e1d53'
+down_revision = '9c5d2e7f4b18'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists')
+
+# rows converted per statement, each batch commits on its own
+BATCH_SIZE = 5000
+
+SEARCH_VECTOR = (
+    "ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce({genres}, '')), 'C')) STORED"
+)
+
+
+def batched(table, statement):
+    # Convert in id ranges so no single statement holds locks on the whole table.
+    bind = op.get_bind()
+    low, high = bind.execute(sa.text(f'SELECT min(id), max(id) FROM {table}')).first()
+    if low is None:
+        return
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, BATCH_SIZE):
+            op.execute(sa.text(statement + ' WHERE id >= :start AND id < :stop').bindparams(
+                start=start, stop=start + BATCH_SIZE))
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE OR REPLACE FUNCTION fyyur_genres_text(varchar[]) RETURNS text "
+            "LANGUAGE sql IMMUTABLE AS $$ SELECT array_to_string($1, ' ') $$"
+        )
+        for table in TABLES:
+            op.add_column(table, sa.Column('genres_list', postgresql.ARRAY(sa.String(120))))
+            # Old rows hold either one genre or a flattened '{Jazz,"Hip-Hop"}' literal.
+            batched(table, (
+                f"UPDATE {table} SET genres_list = CASE "
+                "WHEN genres IS NULL OR genres = '' THEN '{}'::varchar[] "
+                "WHEN genres LIKE '{%}' THEN genres::varchar[] "
+                "ELSE ARRAY[genres] END"
+            ))
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search_vector')
+            op.drop_column(table, 'search_vector')
+            op.drop_column(table, 'genres')
+            op.alter_column(table, 'genres_list', new_column_name='genres')
+            op.execute(SEARCH_VECTOR.format(table=table, genres='fyyur_genres_text(genres)'))
+            op.execute(f'CREATE INDEX ix_{table}_search_vector ON {table} USING GIN (search_vector)')
+            op.execute(f'CREATE INDEX ix_{table}_genres ON {table} USING GIN (genres)')
+
+    elif op.get_bind().dialect.name == 'sqlite':
+        # The column keeps its TEXT affinity and now holds JSON lists.
+        for table in TABLES:
+            batched(table, (
+                f"UPDATE {table} SET genres = CASE "
+                "WHEN genres IS NULL OR genres = '' THEN '[]' "
+                "WHEN json_valid(genres) AND json_type(genres) = 'array' THEN genres "
+                "WHEN genres LIKE '{%}' THEN "
+                "'[\"' || replace(replace(trim(genres, '{}'), '\"', ''), ',', '\",\"') || '\"]' "
+                "ELSE json_array(genres) END"
+            ))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_genres')
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search_vector')
+            op.drop_column(table, 'search_vector')
+            op.add_column(table, sa.Column('genres_text', sa.String(120)))
+            batched(table, f"UPDATE {table} SET genres_text = array_to_string(genres, ',')")
+            op.drop_column(table, 'genres')
+            op.alter_column(table, 'genres_text', new_column_name='genres')
+            op.execute(SEARCH_VECTOR.format(table=table, genres='genres'))
+            op.execute(f'CREATE INDEX ix_{table}_search_vector ON {table} USING GIN (search_vector)')
+        op.execute('DROP FUNCTION IF EXISTS fyyur_genres_text(varchar[])')
+
+    elif op.get_bind().dialect.name == 'sqlite':
+        for table in TABLES:
+            batched(table, (
+                f"UPDATE {table} SET genres = CASE WHEN json_valid(genres) "
+                "THEN (SELECT group_concat(value, ',') FROM json_each(genres)) "
+                "ELSE genres END"
+            ))
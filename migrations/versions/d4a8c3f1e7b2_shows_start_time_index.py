@@ -0,0 +1,28 @@
+"""range index on shows.start_time for the calendar
+
+Revision ID: d4a8c3f1e7b2
+Revises: b2f64a8e1d53
+Create Date: 2026-10-18 20:14:37.512083
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8c3f1e7b2'
+down_revision = 'b2f64a8e1d53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same as the other show indexes: built concurrently, outside the
+    # migration's transaction.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_shows_start_time_id', table_name='shows', postgresql_concurrently=True)
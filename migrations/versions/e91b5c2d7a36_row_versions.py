@@ -0,0 +1,29 @@
+"""row versions on venues and artists for API ETags
+
+Revision ID: e91b5c2d7a36
+Revises: d4a8c3f1e7b2
+Create Date: 2026-10-18 21:03:12.274519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91b5c2d7a36'
+down_revision = 'd4a8c3f1e7b2'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists')
+
+
+def upgrade():
+    # A constant default: no table rewrite on Postgres 11+
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_column(table, 'version')
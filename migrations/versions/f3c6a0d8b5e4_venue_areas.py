@@ -0,0 +1,74 @@
+"""venue area summary for the venues page
+
+Revision ID: f3c6a0d8b5e4
+Revises: e91b5c2d7a36
+Create Date: 2026-10-18 21:48:05.118346
+
+"""
+from datetime import datetime
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c6a0d8b5e4'
+down_revision = 'e91b5c2d7a36'
+branch_labels = None
+depends_on = None
+
+# summary rows inserted per statement
+BATCH_SIZE = 500
+
+
+def upgrade():
+    op.create_table(
+        'venue_areas',
+        sa.Column('state', sa.String(length=120), nullable=False),
+        sa.Column('city', sa.String(length=120), nullable=False),
+        sa.Column('venue_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('venues', sa.JSON(), nullable=False),
+        sa.Column('dirty_since', sa.DateTime(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('state', 'city')
+    )
+    op.create_index('ix_venue_areas_dirty_since', 'venue_areas', ['dirty_since'])
+
+    # Build the summary here, so the venues page has it from the first
+    # request on. Same rows as database/areas.py rebuild_areas().
+    bind = op.get_bind()
+    venues = bind.execute(sa.text(
+        "SELECT state, city, id, name, upcoming_shows_count FROM venues "
+        "WHERE state IS NOT NULL AND city IS NOT NULL ORDER BY state, city, id"
+    )).all()
+    areas = sa.table(
+        'venue_areas',
+        sa.column('state', sa.String), sa.column('city', sa.String),
+        sa.column('venue_count', sa.Integer), sa.column('upcoming_shows_count', sa.Integer),
+        sa.column('venues', sa.JSON), sa.column('refreshed_at', sa.DateTime),
+    )
+    now = datetime.now()
+    rows = []
+    for (state, city), area in groupby(venues, key=lambda row: (row.state, row.city)):
+        listed = [{'id': row.id, 'name': row.name, 'num_upcoming_shows': row.upcoming_shows_count}
+                  for row in area]
+        rows.append({
+            'state': state,
+            'city': city,
+            'venue_count': len(listed),
+            'upcoming_shows_count': sum(venue['num_upcoming_shows'] for venue in listed),
+            'venues': listed,
+            'refreshed_at': now,
+        })
+        if len(rows) == BATCH_SIZE:
+            op.bulk_insert(areas, rows)
+            rows = []
+    if rows:
+        op.bulk_insert(areas, rows)
+
+
+def downgrade():
+    op.drop_index('ix_venue_areas_dirty_since', table_name='venue_areas')
+    op.drop_table('venue_areas')
@@ -0,0 +1,137 @@
+'''
+Time spent in @requires_auth per request, with the verified-token cache
+on and off.
+
+Signs RS256 tokens for a few users with a throwaway key, serves its JWKS
+from a local HTTP server and calls a view wrapped in requires_auth for
+each request, every user sending its token over and over like a browser
+session does. Prints the p50/p99 overhead in microseconds and the number
+of full signature checks per mode as JSON.
+
+    python benchmarks/auth_overhead.py --users 20 --requests 5000
+
+Run it from the backend directory.
+'''
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import rsa
+from flask import Flask
+from jose import jwk, jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth import auth
+
+PERMISSION = 'get:drinks-detail'
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def signing_key(kid):
+    '''
+    (private key PEM, public JWK) of a fresh RSA key.
+    '''
+    public, private = rsa.newkeys(2048)
+    key = jwk.construct(public.save_pkcs1().decode(), algorithm='RS256').to_dict()
+    key.update(kid=kid, use='sig')
+    return private.save_pkcs1().decode(), key
+
+
+def serve_jwks(keys):
+    body = json.dumps({'keys': keys}).encode()
+
+    class JWKSHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), JWKSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/.well-known/jwks.json'
+
+
+def token(private_key, kid, user):
+    return jwt.encode({
+        'iss': 'https://' + auth.AUTH0_DOMAIN + '/',
+        'aud': auth.API_AUDIENCE,
+        'sub': f'auth0|user{user}',
+        'iat': int(time.time()),
+        'exp': int(time.time()) + 3600,
+        'permissions': [PERMISSION],
+    }, private_key, algorithm='RS256', headers={'kid': kid})
+
+
+def measure(app, view, tokens):
+    timings = []
+    for token in tokens:
+        headers = {'Authorization': 'Bearer ' + token}
+        with app.test_request_context('/drinks-detail', headers=headers):
+            started = time.perf_counter()
+            view()
+            timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='distinct tokens')
+    parser.add_argument('--requests', type=int, default=5000, help='measured requests per mode')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    private_key, public_key = signing_key('bench')
+    auth.jwks_cache = auth.JWKSCache(serve_jwks([public_key]))
+    tokens = [token(private_key, 'bench', user) for user in range(args.users)]
+
+    verifications = []
+    verify_decode_jwt = auth.verify_decode_jwt
+
+    def counted(token):
+        verifications.append(1)
+        return verify_decode_jwt(token)
+
+    auth.verify_decode_jwt = counted
+    app = Flask(__name__)
+    view = auth.requires_auth(PERMISSION)(lambda payload: payload)
+
+    results = {}
+    for mode, size in (('cache off', 0), ('cache on', auth.TOKEN_CACHE_SIZE)):
+        auth.token_cache = auth.TokenCache(size)
+        # the first request of each user fetches the keys and fills the cache
+        measure(app, view, tokens)
+        verifications.clear()
+        rng = random.Random(args.seed)
+        timings = measure(app, view, [rng.choice(tokens) for _ in range(args.requests)])
+        results[mode] = {
+            'p50_us': round(percentile(timings, 0.5), 1),
+            'p99_us': round(percentile(timings, 0.99), 1),
+            'mean_us': round(sum(timings) / len(timings), 1),
+            'signature_checks': len(verifications),
+        }
+
+    print(json.dumps({
+        'users': args.users,
+        'requests': args.requests,
+        'token_cache_size': auth.TOKEN_CACHE_SIZE,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
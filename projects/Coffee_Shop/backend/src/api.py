@@ -1,15 +1,17 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
 from .database.models import db_drop_and_create_all, setup_db, Drink
 from .auth.auth import AuthError, requires_auth
+from .cache import MenuCache
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+menu_cache = MenuCache()
 
 '''
 @TODO uncomment the following line to initialize the datbase
@@ -20,6 +22,83 @@ CORS(app)
 db_drop_and_create_all()
 
 # ROUTES
+
+MAX_PAGE_SIZE = 500
+DRINK_FIELDS = ('id', 'title', 'recipe')
+
+'''
+page_args()
+    the listing arguments of a drinks request, aborting with 400 when
+    they are malformed
+        limit   drinks per page (at most MAX_PAGE_SIZE), every drink when
+                it is not given, which is what the frontend expects
+        after   the `next` cursor of the previous page
+        title   only drinks whose title starts with it
+        fields  comma separated subset of DRINK_FIELDS to return
+'''
+def page_args():
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+        after = int(request.args['after']) if 'after' in request.args else None
+    except ValueError:
+        abort(400, 'limit and after must be integers.')
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        abort(400, f'limit must be between 1 and {MAX_PAGE_SIZE}.')
+
+    fields = DRINK_FIELDS
+    if 'fields' in request.args:
+        fields = tuple(field.strip() for field in request.args['fields'].split(',') if field.strip())
+        if not fields or any(field not in DRINK_FIELDS for field in fields):
+            abort(400, f'fields must be a comma separated list of {", ".join(DRINK_FIELDS)}.')
+
+    return limit, after, request.args.get('title', ''), fields
+
+
+'''
+drink_page(recipe, limit, after, title, fields)
+    one page of drinks in id order as dicts of `fields`, and the cursor
+    of the next page (None on the last one, and without a limit)
+    only the requested columns are selected, `recipe` is the column
+    behind the recipe field (Drink.short_recipe or Drink.recipe)
+'''
+def drink_page(recipe, limit, after, title, fields):
+    columns = {'id': Drink.id, 'title': Drink.title, 'recipe': recipe}
+    # the id is the cursor, so it is always selected
+    names = ['id'] + [field for field in fields if field != 'id']
+    query = Drink.query.with_entities(*[columns[name] for name in names])
+    if after is not None:
+        query = query.filter(Drink.id > after)
+    if title:
+        prefix = title.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(Drink.title.like(prefix + '%', escape='\\'))
+    query = query.order_by(Drink.id)
+    if limit is None:
+        rows = query.all()
+        limit = len(rows)
+    else:
+        rows = query.limit(limit + 1).all()
+
+    cursor = rows[limit - 1][0] if len(rows) > limit else None
+    drinks = [
+        {name: value for name, value in zip(names, row) if name in fields}
+        for row in rows[:limit]
+    ]
+    return drinks, cursor
+
+
+'''
+menu_body(args)
+    the GET /drinks response body for the page_args() `args`
+'''
+def menu_body(args):
+    drinks, cursor = drink_page(Drink.short_recipe, *args)
+    return json.dumps({
+        'success': True,
+        'drinks': drinks,
+        'next': cursor
+    }).encode()
+
+
 '''
 @TODO implement endpoint
     GET /drinks
@@ -30,21 +109,14 @@ db_drop_and_create_all()
 '''
 @app.route('/drinks', methods=['GET'])
 def get_drinks():
-    try:
-        drinks = Drink.query.all()
+    args = page_args()
+    entry = menu_cache.get(args, lambda: menu_body(args))
 
-        if not drinks:
-            abort(404)
-
-        drinks = [drink.short() for drink in drinks]
-
-        return jsonify({
-            'success': True,
-            'drinks': drinks
-        }), 200
-
-    except Exception as error:
-        raise error
+    response = Response(entry.body, status=200, mimetype='application/json')
+    response.set_etag(entry.etag)
+    # clients keep the menu but ask before using it, and get a 304 while it is unchanged
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 
@@ -61,21 +133,13 @@ def get_drinks():
 @app.route('/drinks-detail', methods=['GET'])
 @requires_auth('get:drinks-detail')
 def get_drink_details(jwt):
-    try:
-        drinks = Drink.query.all()
+    drinks, cursor = drink_page(Drink.recipe, *page_args())
 
-        if not drinks:
-            abort(404)
-
-        drinks = [drink.long() for drink in drinks]
-
-        return jsonify({
-            'success': True,
-            'drinks': drinks
-        }), 200
-
-    except Exception as error:
-        raise error
+    return jsonify({
+        'success': True,
+        'drinks': drinks,
+        'next': cursor
+    }), 200
 
 '''
 @TODO implement endpoint
@@ -98,16 +162,19 @@ def create_drink(jwt):
 
         drink = Drink(
             title=new_drink.get('title'),
-            recipe=json.dumps(new_drink.get('recipe'))
+            recipe=new_drink.get('recipe')
         )
         
         drink.insert()
+        menu_cache.bump()
 
         return jsonify({
             'success': True,
             'drinks': drink.long()
         }), 201
 
+    except ValueError as error:
+        abort(400, str(error))
     except exc.SQLAlchemyError:
         abort(422)
     except Exception as error:
@@ -143,9 +210,10 @@ def edit_drink(jwt, drink_id):
             recipe = json.loads(request.data)['recipe']
             if not isinstance(recipe, list):
                 abort(400)
-            drink.recipe = json.dumps(recipe)
+            drink.recipe = recipe
 
         drink.update()
+        menu_cache.bump()
 
         return jsonify({
             'success': True,
@@ -154,6 +222,8 @@ def edit_drink(jwt, drink_id):
 
     # except exc.SQLAlchemyError:
     #     abort(422)
+    except ValueError as error:
+        abort(400, str(error))
     except Exception as error:
         raise error
 
@@ -179,6 +249,7 @@ def delete_drink(jwt, drink_id):
             abort(404)
             
         drink.delete()
+        menu_cache.bump()
 
         return jsonify({
             'success': True,
@@ -213,7 +284,7 @@ def authentication_error(error):
     return jsonify({
         'success': False,
         'error': error.status_code,
-        'message': error.description
+        'message': error.error['description']
     }), error.status_code
 
 @app.errorhandler(403)
@@ -246,6 +317,14 @@ def internal_server_error(error):
 '''
 Request
 '''
+@app.errorhandler(400)
+def bad_request(error):
+    return jsonify({
+        "success": False,
+        "error": 400,
+        "message": error.description
+    }), 400
+
 @app.errorhandler(422)
 def unprocessable(error):
     return jsonify({
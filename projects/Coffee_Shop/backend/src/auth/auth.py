@@ -1,13 +1,28 @@
+import hashlib
 import json
-from flask import request, _request_ctx_stack, abort
+import threading
+import time
+from collections import OrderedDict
+from flask import request, abort
 from functools import wraps
-from jose import jwt
+from jose import jwk, jwt
 from urllib.request import urlopen
 
 
 AUTH0_DOMAIN = 'dev--mvz-3ey.us.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'Shop'
+JWKS_URL = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
+
+# keys are refetched in the background once they are this old (seconds)
+JWKS_TTL = 600
+# an unknown kid refetches the keys at most this often (seconds)
+JWKS_MIN_REFRESH_INTERVAL = 30
+JWKS_TIMEOUT = 5
+# verified tokens kept in memory, 0 verifies every request
+TOKEN_CACHE_SIZE = 1024
+# how long a revoke_subject() holds (seconds), the access token lifetime
+SUBJECT_REVOCATION_TTL = 86400
 
 ## AuthError Exception
 
@@ -17,15 +32,244 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+## JWKS Key Cache
+
+def keys_unavailable():
+    return AuthError({
+        'code': 'jwks_unavailable',
+        'description': 'Unable to fetch the signing keys.'
+    }, 503)
+
+
+'''
+JWKSCache
+    process-wide store of the signing keys of JWKS_URL, indexed by kid
+    and ready for jwt.decode
+
+    Keys older than the TTL are still served while one background thread
+    fetches new ones. Requests that find no keys at all wait for a single
+    shared fetch. A kid that is not in the set (the tenant rotated its
+    keys) forces a refetch, at most once per min_refresh_interval. Fetches
+    that fail count as attempts too, so while the endpoint is down a cold
+    cache answers 503 without calling it more than once per interval.
+'''
+
+
+class JWKSCache:
+    def __init__(self, url, ttl=JWKS_TTL, min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL, timeout=JWKS_TIMEOUT):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.keys = {}
+        self.fetched_at = None
+        self.attempted_at = None
+        # bumped by every successful fetch
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
+
+    def get(self, kid):
+        '''
+        The key for `kid`, or None when the key set does not have it.
+        '''
+        if self.fetched_at is None:
+            self.refresh(self.generation)
+            if self.fetched_at is None:
+                # the last attempt failed, too recently to try again
+                raise keys_unavailable()
+        elif time.monotonic() - self.fetched_at >= self.ttl:
+            self.refresh_in_background()
+
+        key = self.keys.get(kid)
+        if key is None and self.may_refresh():
+            self.refresh(self.generation)
+            key = self.keys.get(kid)
+        return key
+
+    def may_refresh(self):
+        with self.lock:
+            return self.attempted_at is None or \
+                time.monotonic() - self.attempted_at >= self.min_refresh_interval
+
+    def refresh(self, generation):
+        '''
+        Fetches the key set unless another thread fetched it since
+        `generation` was read, in which case it waits for that fetch, or
+        an attempt failed less than min_refresh_interval ago.
+        '''
+        with self.fetch_lock:
+            if self.generation == generation and self.may_refresh():
+                self.fetch()
+
+    def refresh_in_background(self):
+        # only one refresh at a time, and not more often than a forced one
+        if not self.may_refresh() or not self.fetch_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.fetch()
+            except AuthError:
+                pass  # the old keys keep being served until the next attempt
+            finally:
+                self.fetch_lock.release()
+
+        threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+    def fetch(self):
+        with self.lock:
+            self.attempted_at = time.monotonic()
+        try:
+            with urlopen(self.url, timeout=self.timeout) as response:
+                jwks = json.loads(response.read())
+            keys = {
+                key['kid']: jwk.construct(key, algorithm=ALGORITHMS[0])
+                for key in jwks['keys']
+                if key.get('kty') == 'RSA' and 'kid' in key
+            }
+        except Exception:
+            raise keys_unavailable()
+        with self.lock:
+            self.keys = keys
+            self.fetched_at = time.monotonic()
+            self.generation += 1
+
+
+jwks_cache = JWKSCache(JWKS_URL)
+
+## Verified Token Cache
+
+'''
+TokenCache
+    bounded LRU of the payloads of tokens that passed verify_decode_jwt,
+    keyed by the SHA-256 of the token and kept until the token's exp
+
+    A bearer token is sent on every request of a session, so only its
+    first request pays for the signature check. Tokens without an exp are
+    not cached.
+
+    It also holds the revocations: a revoked token is refused until its
+    exp, and revoking a user refuses every token of theirs issued up to
+    then for SUBJECT_REVOCATION_TTL. Both are checked on every request,
+    whether the payload came from the cache or not.
+'''
+
+
+class TokenCache:
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, subject_ttl=SUBJECT_REVOCATION_TTL):
+        self.maxsize = maxsize
+        self.subject_ttl = subject_ttl
+        self.entries = OrderedDict()
+        # token key: exp, sub: (revoked at, held until)
+        self.revoked_tokens = {}
+        self.revoked_subjects = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        if not self.maxsize:
+            return None
+        key = self.key(token)
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is None:
+                return None
+            if payload['exp'] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return payload
+
+    def put(self, token, payload):
+        if not self.maxsize or not isinstance(payload.get('exp'), (int, float)):
+            return
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = payload
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    '''
+    revoke(token), revoke_subject(sub)
+        refuse the token, or the tokens of the user `sub` issued so far
+    is_revoked(token, payload)
+        whether a verified token was revoked
+    clear()
+        drops the verified tokens, the revocations stay
+    '''
+
+    def revoke(self, token):
+        try:
+            exp = jwt.get_unverified_claims(token).get('exp')
+        except Exception:
+            exp = None
+        key = self.key(token)
+        with self.lock:
+            self.entries.pop(key, None)
+            # a token without a readable exp stays revoked
+            self.revoked_tokens[key] = exp if isinstance(exp, (int, float)) else float('inf')
+
+    def revoke_subject(self, sub):
+        now = time.time()
+        with self.lock:
+            for key in [key for key, payload in self.entries.items() if payload.get('sub') == sub]:
+                del self.entries[key]
+            self.revoked_subjects[sub] = (now, now + self.subject_ttl)
+
+    def is_revoked(self, token, payload):
+        now = time.time()
+        with self.lock:
+            exp = self.revoked_tokens.get(self.key(token))
+            if exp is not None:
+                if exp > now:
+                    return True
+                del self.revoked_tokens[self.key(token)]
+
+            revoked = self.revoked_subjects.get(payload.get('sub'))
+            if revoked is not None:
+                revoked_at, until = revoked
+                if until <= now:
+                    del self.revoked_subjects[payload['sub']]
+                elif not isinstance(payload.get('iat'), (int, float)) or payload['iat'] <= revoked_at:
+                    return True
+        return False
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
 def requires_auth(permission=''):
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            try:
-                payload = verify_decode_jwt(token)
-            except:
-                abort(401)
+            payload = token_cache.get(token)
+            if payload is None:
+                try:
+                    payload = verify_decode_jwt(token)
+                except AuthError as error:
+                    # the keys being unavailable is not the client's fault
+                    if error.error['code'] == 'jwks_unavailable':
+                        raise
+                    abort(401)
+                except:
+                    abort(401)
+                token_cache.put(token, payload)
+
+            if token_cache.is_revoked(token, payload):
+                raise AuthError({
+                    'code': 'token_revoked',
+                    'description': 'Token revoked.'
+                }, 401)
 
             check_permissions(permission, payload)
 
@@ -76,26 +320,15 @@ def check_permissions(permission, payload):
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-    if rsa_key:
+    rsa_key = jwks_cache.get(unverified_header['kid'])
+    if rsa_key is not None:
         try:
             payload = jwt.decode(
                 token,
@@ -0,0 +1,61 @@
+import hashlib
+import threading
+
+'''
+MenuCache
+    serialized GET /drinks responses, kept until the menu changes
+
+    The menu only changes through the create, edit and delete endpoints,
+    which call bump() once their commit went through. get() builds the
+    body of a page on its first request after a bump and serves the
+    stored bytes and ETag to every request after that without touching
+    the database. Pages are keyed by their listing arguments, at most
+    MAX_ENTRIES of them.
+
+    The version lives in the process, so the app has to run as a single
+    process (flask run) for every request to see the bumps.
+'''
+
+MAX_ENTRIES = 256
+
+
+class MenuEntry:
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+
+
+class MenuCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.version = 0
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    '''
+    get(key, build)
+        the entry of `key` for the current version, calling build() for
+        the body bytes when there is none
+        a bump during the build keeps the result from being stored
+    '''
+
+    def get(self, key, build):
+        version = self.version
+        entry = self.entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+
+        entry = MenuEntry(version, build())
+        with self.lock:
+            if self.version == version:
+                if key not in self.entries and len(self.entries) >= self.max_entries:
+                    # drop the oldest page
+                    self.entries.pop(next(iter(self.entries)))
+                self.entries[key] = entry
+        return entry
+
+    def bump(self):
+        with self.lock:
+            self.version += 1
+            self.entries = {}
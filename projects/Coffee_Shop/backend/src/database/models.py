@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, JSON
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -36,7 +37,7 @@ def db_drop_and_create_all():
     # add one demo row which is helping in POSTMAN test
     drink = Drink(
         title='water',
-        recipe='[{"name": "water", "color": "blue", "parts": 1}]'
+        recipe=[{'name': 'water', 'color': 'blue', 'parts': 1}]
     )
 
 
@@ -54,9 +55,41 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, stored as JSON and parsed once when the row loads
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe = Column(String(180), nullable=False)
+    recipe = Column(JSON, nullable=False)
+    # the short() recipe, kept in step with recipe when it is set
+    short_recipe = Column(JSON, nullable=False)
+
+    '''
+    validates recipe
+        accepts the ingredient list, a single ingredient or the list as a
+        JSON string, and computes short_recipe from it
+        raises ValueError when it is not a non-empty list of ingredients
+        with a string name and color and numeric parts
+    '''
+
+    @validates('recipe')
+    def validate_recipe(self, key, recipe):
+        if isinstance(recipe, str):
+            try:
+                recipe = json.loads(recipe)
+            except ValueError:
+                raise ValueError('recipe is not valid JSON.')
+        if isinstance(recipe, dict):
+            recipe = [recipe]
+        if not isinstance(recipe, list) or not recipe:
+            raise ValueError('recipe must be a non-empty list of ingredients.')
+        for ingredient in recipe:
+            if not isinstance(ingredient, dict):
+                raise ValueError('each ingredient must be an object.')
+            if not isinstance(ingredient.get('name'), str) or not isinstance(ingredient.get('color'), str):
+                raise ValueError('each ingredient needs a name and a color.')
+            parts = ingredient.get('parts')
+            if isinstance(parts, bool) or not isinstance(parts, (int, float)):
+                raise ValueError('each ingredient needs a number of parts.')
+        self.short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+        return recipe
 
     '''
     short()
@@ -64,12 +97,10 @@ class Drink(db.Model):
     '''
 
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': self.short_recipe
         }
 
     '''
@@ -81,7 +112,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
     '''
@@ -125,4 +156,4 @@ class Drink(db.Model):
         db.session.commit()
 
     def __repr__(self):
-        return json.dumps(self.short())
+        return f'<Drink {self.id} {self.title}>'
@@ -0,0 +1,200 @@
+'''
+JWKSCache against a local stand-in for the Auth0 JWKS endpoint.
+'''
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import rsa
+from flask import Flask
+from jose import jwk, jwt
+from werkzeug.exceptions import Unauthorized
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth import auth
+from src.auth.auth import JWKSCache, AuthError
+
+
+def public_jwk(kid):
+    public, private = rsa.newkeys(512)
+    key = jwk.construct(public.save_pkcs1().decode(), algorithm='RS256').to_dict()
+    key.update(kid=kid, use='sig')
+    return key
+
+
+class JWKSServer:
+    '''
+    Serves {'keys': self.keys}, answering after `delay` seconds, or with a
+    500 while `failing`. `fetches` counts the requests.
+    '''
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.delay = 0
+        self.failing = False
+        self.fetches = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.fetches += 1
+                time.sleep(stand_in.delay)
+                if stand_in.failing:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps({'keys': stand_in.keys}).encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/.well-known/jwks.json'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(scope='module')
+def keys():
+    return {kid: public_jwk(kid) for kid in ('k1', 'k2')}
+
+
+@pytest.fixture
+def server(keys):
+    server = JWKSServer([keys['k1']])
+    yield server
+    server.close()
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_concurrent_cold_misses_share_one_fetch(server):
+    server.delay = 0.2
+    cache = JWKSCache(server.url)
+    found = []
+    start = threading.Barrier(20)
+
+    def request():
+        start.wait()
+        found.append(cache.get('k1'))
+
+    threads = [threading.Thread(target=request) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert server.fetches == 1
+    assert len(found) == 20 and all(key is not None for key in found)
+
+
+def test_stale_keys_are_served_while_refreshing(server, keys):
+    cache = JWKSCache(server.url, ttl=0.1, min_refresh_interval=0)
+    first = cache.get('k1')
+    server.delay = 0.5
+    server.keys = [keys['k1'], keys['k2']]
+    time.sleep(0.15)
+
+    started = time.monotonic()
+    assert cache.get('k1') is first
+    assert time.monotonic() - started < 0.2
+
+    wait_for(lambda: 'k2' in cache.keys)
+    assert server.fetches == 2
+
+
+def test_unknown_kid_refreshes_at_most_once_per_interval(server, keys):
+    cache = JWKSCache(server.url, min_refresh_interval=0.3)
+    cache.get('k1')
+    assert cache.get('k2') is None
+    assert server.fetches == 1
+
+    time.sleep(0.35)
+    for _ in range(5):
+        assert cache.get('unknown') is None
+    assert server.fetches == 2
+
+    # a rotated key shows up on the first forced refresh after the interval
+    server.keys = [keys['k1'], keys['k2']]
+    time.sleep(0.35)
+    assert cache.get('k2') is not None
+    assert server.fetches == 3
+
+
+def test_cached_keys_are_served_during_an_outage(server):
+    cache = JWKSCache(server.url, ttl=0.1, min_refresh_interval=0.05)
+    first = cache.get('k1')
+    server.failing = True
+    time.sleep(0.15)
+
+    assert cache.get('k1') is first
+    wait_for(lambda: server.fetches == 2 and not cache.fetch_lock.locked())
+    time.sleep(0.1)
+    assert cache.get('k1') is first
+    assert server.fetches >= 2
+
+
+def test_cold_cache_with_the_endpoint_down_is_a_503(server):
+    server.failing = True
+    with pytest.raises(AuthError) as error:
+        JWKSCache(server.url).get('k1')
+    assert error.value.status_code == 503
+
+
+def test_cold_cache_retries_at_most_once_per_interval(server):
+    server.failing = True
+    cache = JWKSCache(server.url, min_refresh_interval=0.3)
+    for _ in range(5):
+        with pytest.raises(AuthError) as error:
+            cache.get('k1')
+        assert error.value.status_code == 503
+    assert server.fetches == 1
+
+    server.failing = False
+    time.sleep(0.35)
+    assert cache.get('k1') is not None
+    assert server.fetches == 2
+
+
+def authorize(token):
+    view = auth.requires_auth('get:drinks-detail')(lambda payload: payload)
+    with Flask(__name__).test_request_context(headers={'Authorization': 'Bearer ' + token}):
+        return view()
+
+
+@pytest.fixture
+def auth_cache(server, monkeypatch):
+    monkeypatch.setattr(auth, 'jwks_cache', JWKSCache(server.url))
+    monkeypatch.setattr(auth, 'token_cache', auth.TokenCache(0))
+
+
+@pytest.mark.parametrize('kid', ['k1', 'unknown'])
+def test_tokens_that_fail_verification_are_a_401(auth_cache, kid):
+    # signed with a shared secret instead of the tenant's RSA key
+    token = jwt.encode({'sub': 'someone'}, 'secret', algorithm='HS256', headers={'kid': kid})
+    with pytest.raises(Unauthorized):
+        authorize(token)
+
+
+def test_unavailable_keys_are_a_503(auth_cache, server):
+    server.failing = True
+    token = jwt.encode({'sub': 'someone'}, 'secret', algorithm='HS256', headers={'kid': 'k1'})
+    with pytest.raises(AuthError) as error:
+        authorize(token)
+    assert error.value.status_code == 503
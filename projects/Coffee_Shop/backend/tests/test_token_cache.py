@@ -0,0 +1,88 @@
+'''
+Revocation through TokenCache, with requires_auth in front of a view.
+'''
+import os
+import sys
+import time
+
+import pytest
+from flask import Flask
+from jose import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth import auth
+from src.auth.auth import AuthError, TokenCache
+
+PERMISSION = 'get:drinks-detail'
+
+
+def token(sub, iat, exp):
+    return jwt.encode({'sub': sub, 'iat': iat, 'exp': exp, 'permissions': [PERMISSION]},
+                      'secret', algorithm='HS256')
+
+
+@pytest.fixture
+def verifications(monkeypatch):
+    '''
+    Skips the signature check, counting how often it runs.
+    '''
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        return jwt.get_unverified_claims(token)
+
+    monkeypatch.setattr(auth, 'verify_decode_jwt', verify)
+    monkeypatch.setattr(auth, 'token_cache', TokenCache())
+    return calls
+
+
+def authorize(token):
+    view = auth.requires_auth(PERMISSION)(lambda payload: payload)
+    with Flask(__name__).test_request_context(headers={'Authorization': 'Bearer ' + token}):
+        return view()
+
+
+def refused(token):
+    with pytest.raises(AuthError) as error:
+        authorize(token)
+    return error.value.status_code == 401 and error.value.error['code'] == 'token_revoked'
+
+
+def test_a_revoked_token_stays_refused(verifications):
+    now = int(time.time())
+    revoked, other = token('alice', now - 10, now + 60), token('bob', now - 10, now + 60)
+    authorize(revoked)
+    authorize(other)
+
+    auth.token_cache.revoke(revoked)
+    assert refused(revoked)
+    # verified again, still refused
+    assert refused(revoked)
+    assert authorize(other)['sub'] == 'bob'
+
+
+def test_revoking_a_subject_refuses_the_tokens_issued_before(verifications):
+    now = int(time.time())
+    old, other = token('alice', now - 10, now + 60), token('bob', now - 10, now + 60)
+    authorize(old)
+
+    auth.token_cache.revoke_subject('alice')
+    assert refused(old)
+    assert authorize(other)['sub'] == 'bob'
+    assert authorize(token('alice', now + 1, now + 60))['sub'] == 'alice'
+
+
+def test_revocations_end_with_the_token():
+    cache = TokenCache(subject_ttl=0.1)
+    now = int(time.time())
+    expired = token('alice', now - 10, now - 1)
+    cache.revoke(expired)
+    cache.revoke_subject('bob')
+
+    assert not cache.is_revoked(expired, jwt.get_unverified_claims(expired))
+    assert not cache.revoked_tokens
+    time.sleep(0.15)
+    assert not cache.is_revoked('other', {'sub': 'bob', 'iat': now - 10})
+    assert not cache.revoked_subjects
@@ -1,17 +1,33 @@
 
 # Imports
 
+import json
 import logging
+from datetime import datetime, timedelta
+from itertools import groupby
 from logging import Formatter, FileHandler
-import babel
-import dateutil.parser
-from flask import Flask, render_template, request, flash, redirect, url_for, abort
+import click
+from flask import Flask, render_template, stream_template, request, flash, redirect, url_for, abort, session, jsonify
 from flask_migrate import Migrate
 from flask_moment import Moment
+from flask.cli import AppGroup
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 
 from forms import *
+from cache import PageCache
+from filters import format_datetime
+import importer
+from profiler import SQLProfiler
 from database.models import Artist,Venue,Show,db
+from database.queries import entity_with_shows, touch_partners, has_genre
+from database.search import search
+from database.pagination import keyset_page, page_limit, page_url, StreamedPage
+from database import counters
+from database.pool import init_pool_telemetry, pool_status
+from database.routing import replicas, primary, replica, read_from_primary
+from database.areas import AreaSummary, mark_venue_areas, refresh_areas, rebuild_areas, summary_page
+from database import partitions
 
 # Config.
 
@@ -19,17 +35,31 @@ from database.models import Artist,Venue,Show,db
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-migrate = Migrate(app, db)
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+class JSONProvider(DefaultJSONProvider):
+    # ISO 8601 datetimes in JSON responses instead of HTTP dates
+    @staticmethod
+    def default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return DefaultJSONProvider.default(value)
+
+app.json = JSONProvider(app)
+db.init_app(app)
+migrate = Migrate(app, db)
+sql_profiler = SQLProfiler()
+with app.app_context():
+    for engine in db.engines.values():
+        init_pool_telemetry(engine, app.config['DB_POOL_SLOW_WAIT_MS'])
+    replicas.init_app(app, db.engines)
+    sql_profiler.init_app(app, *db.engines.values())
+    area_summary = AreaSummary()
+    area_summary.init_app(app, db.engine)
+page_cache = PageCache()
+page_cache.init_app(app)
 
 app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.globals['page_url'] = page_url
 
 #---#ROUTES#---#
 
@@ -39,39 +69,54 @@ def index():
 
 #---#VENUES#---#
 
-@app.route('/venues')
-def venues():
-
-    areas = db.session.query(Venue.city, Venue.state).distinct(Venue.city, Venue.state)
+def venue_areas(page):
+    '''
+    The venues of a listing page grouped by area, as the page and the API
+    show them.
+    '''
     response = []
-    for area in areas:
-
-        # Querying venues and filter them based on area (city, venue)
-
-        result = Venue.query.filter(Venue.state == area.state).filter(Venue.city == area.city
-        ).all()
-
-        venue_data = []
-
-        # Creating venues' response
-        for venue in result:
-            venue_data.append({
+    for (city, state), venues_in_area in groupby(page.items, key=lambda row: (row.city, row.state)):
+        response.append({
+            'city': city,
+            'state': state,
+            'venues': [{
                 'id': venue.id,
                 'name': venue.name,
-                'num_upcoming_shows': len(db.session.query(
-                  Show
-                    ).filter(
-                    Show.start_time > datetime.now()
-                    ).all())
-            })
-
-            response.append({
-                'city': area.city,
-                'state': area.state,
-                'venues': venue_data
-            })
+                'num_upcoming_shows': venue.num_upcoming_shows
+            } for venue in venues_in_area]
+        })
+    return response
+
+def venues_page():
+    '''
+    One page of the venues listing: (areas, page, genre). Pages hold at
+    most the page size of venues, read from the venue_areas summary.
+    Genre filtered pages group the matching venues instead.
+    '''
+    genre = request.args.get('genre')
+    if not genre:
+        area_summary.ensure_fresh()
+        page = summary_page(db.session, page_limit(app.config))
+        return venue_areas(page), page, genre
+
+    # Counts come from the denormalized counters on Venue, so the listing
+    # never touches shows. Rows are ordered so consecutive rows share the
+    # same area (city, state).
+    query = db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+        ).filter(has_genre(Venue, genre))
+
+    page = keyset_page(query, (Venue.state, Venue.city, Venue.id), page_limit(app.config))
+    return venue_areas(page), page, genre
 
-    return render_template('pages/venues.html', areas=response)
+@app.route('/venues')
+def venues():
+    areas, page, genre = venues_page()
+    return render_template('pages/venues.html', areas=areas, page=page, genre=genre)
 
 @app.route('/venues/create', methods=['GET'])
 def create_venue_form():
@@ -88,7 +133,7 @@ def create_venue_submission():
       state=request.form.get('state'),
       address=request.form.get('address'),
       phone=request.form.get('phone'),
-      genres=request.form.get('genres'),
+      genres=request.form.getlist('genres'),
       image_link=request.form.get('image_link'),
       facebook_link=request.form.get('facebook_link'),
       website=request.form.get('website_link'),
@@ -113,10 +158,13 @@ def create_venue_submission():
 @app.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     try:
+        # A bulk delete skips the mapper events, mark the area by hand.
+        mark_venue_areas(db.session.connection(), Venue.id == venue_id)
         Venue.query.filter(Venue.id == venue_id
         ).delete()
 
         db.session.commit()
+        page_cache.invalidate('venue', venue_id)
     except:
         db.session.rollback()
     finally:
@@ -125,68 +173,53 @@ def delete_venue(venue_id):
 
 @app.route('/venues/<int:venue_id>', methods=['GET'])
 def show_venue(venue_id):
-      
-    venue = Venue.query.filter(Venue.id == venue_id
-    ).first()
 
-    past = db.session.query(
-            Show
-            ).filter(
-                Show.venue_id == venue_id
-            ).filter(
-                Show.start_time < datetime.now()
-            ).join(
-                Artist,
-                Show.artist_id == Artist.id
-            ).add_columns(
-                Artist.id,
-                Artist.name,
-                Artist.image_link,
-                Show.start_time
-            ).all()
-
-    upcoming = db.session.query(
-        Show
-        ).filter(
-            Show.venue_id == venue_id
-        ).filter(
-            Show.start_time > datetime.now()
-        ).join(
-            Artist, Show.artist_id == Artist.id
-        ).add_columns(
-            Artist.id,
-            Artist.name,
-            Artist.image_link,
-            Show.start_time
-        ).all()
-
-    upcoming_shows = []
-
-    past_shows = []
-
-    for show in upcoming:
-        upcoming_shows.append({
-            'artist_id': show[1],
-            'artist_name': show[2],
-            'image_link': show[3],
-            'start_time': str(show[4])
-        })
-
-    for show in past:
-        past_shows.append({
-            'artist_id': show[1],
-            'artist_name': show[2],
-            'image_link': show[3],
-            'start_time': str(show[4])
-        })
+    # Pages with pending flash messages are personal, never serve or store them.
+    cacheable = '_flashes' not in session
+    if cacheable:
+        page = page_cache.get('venue', venue_id)
+        if page is not None:
+            return page
+        read_from_primary()
 
-    if venue is None:
+    response, upcoming = venue_details(venue_id)
+    if response is None:
         abort(404)
 
+    page = render_template('pages/show_venue.html', venue=response)
+    if cacheable:
+        page_cache.set('venue', venue_id, page, stale_at=upcoming[0][3] if upcoming else None)
+    return page
+
+def venue_details(venue_id):
+    '''
+    The venue page data with all of its shows, and the raw upcoming show
+    rows. (None, None) for an unknown venue.
+    '''
+    result = entity_with_shows(Venue, venue_id)
+    if result is None:
+        return None, None
+
+    venue, past, upcoming, past_count, upcoming_count = result
+
+    past_shows = [{
+        'artist_id': show[0],
+        'artist_name': show[1],
+        'image_link': show[2],
+        'start_time': show[3]
+    } for show in past]
+
+    upcoming_shows = [{
+        'artist_id': show[0],
+        'artist_name': show[1],
+        'image_link': show[2],
+        'start_time': show[3]
+    } for show in upcoming]
+
     response = {
         "id": venue.id,
         "name": venue.name,
-        "genres": [venue.genres],
+        "genres": venue.genres or [],
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -198,12 +231,13 @@ def show_venue(venue_id):
         "image_link": venue.image_link,
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past),
-        "upcoming_shows_count": len(upcoming),
+        "past_shows_count": past_count,
+        "upcoming_shows_count": upcoming_count,
     }
-    return render_template('pages/show_venue.html', venue=response)
+    return response, upcoming
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@primary
 def edit_venue(venue_id):
 
     form = VenueForm()
@@ -226,7 +260,7 @@ def edit_venue_submission(venue_id):
       venue.city = request.form.get('city')
       venue.state = request.form.get('state')
       venue.phone = request.form.get('phone')
-      venue.genres= request.form.get('genres')
+      venue.genres = request.form.getlist('genres')
       venue.facebook_link = request.form.get('facebook_link')
       venue.image_link = request.form.get('image_link')
       venue.seeking_venue = bool(request.form.get('seeking_venue')=='y')
@@ -234,9 +268,15 @@ def edit_venue_submission(venue_id):
 
 
 
+      # The venue's name and image also appear on its artists' pages.
+      partners = touch_partners(Venue, venue_id)
+
       db.session.add(venue)
       db.session.commit()
 
+      page_cache.invalidate('venue', venue_id)
+      page_cache.invalidate('artist', *partners)
+
       flash(f"{venue.name}'s page was successfully updated!")
 
     except Exception as ex:
@@ -250,104 +290,103 @@ def edit_venue_submission(venue_id):
     return redirect(url_for('show_venue', venue_id=venue.id))
 
 @app.route('/venues/search', methods=['POST'])
+@replica
 def search_venues():
     search_term = request.form.get('search_term', '')
-    
-    result = db.session.query(
-      Venue
-      ).filter(
-        Venue.name.ilike(f'{search_term}')
-      ).all()
+    offset = max(0, request.form.get('offset', 0, type=int))
+    limit = app.config['SEARCH_PAGE_SIZE']
+
+    count, result = search(Venue, search_term, limit, offset)
 
-    count = len(result)
     response = {
         "count": count,
-        "data": result
+        "data": result,
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < count else None
     }
     return render_template('pages/search_venues.html', results=response,
-    search_term=request.form.get('search_term', ''))
+    search_term=search_term)
 
 #---#ARTISTS#---#
 
+def artists_page():
+  query = Artist.query
+
+  genre = request.args.get('genre')
+  if genre:
+    query = query.filter(has_genre(Artist, genre))
+
+  return keyset_page(query, (Artist.id,), page_limit(app.config)), genre
+
 @app.route('/artists')
 def artists():
-  response = Artist.query.all()
-  return render_template('pages/artists.html', artists=response)
+  page, genre = artists_page()
+  return render_template('pages/artists.html', artists=page.items, page=page, genre=genre)
 
 @app.route('/artists/search', methods=['POST'])
+@replica
 def search_artists():
     search_term = request.form.get('search_term', '')
-    result = db.session.query(Artist).filter(Artist.name.ilike(f'%{search_term}%')).all()
-    count = len(result)
+    offset = max(0, request.form.get('offset', 0, type=int))
+    limit = app.config['SEARCH_PAGE_SIZE']
+
+    count, result = search(Artist, search_term, limit, offset)
+
     response = {
         "count": count,
-        "data": result
+        "data": result,
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < count else None
     }
     return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-    artist = Artist.query.filter(Artist.id == artist_id).first()
-
-    past = db.session.query(
-        Show
-        ).filter(
-            Show.artist_id == artist_id
-        ).filter(
-            Show.start_time < datetime.now()
-        ).join(
-            Venue,
-            Show.venue_id == Venue.id
-        ).add_columns(
-            Venue.id, 
-            Venue.name,
-            Venue.image_link,
-            Show.start_time
-        ).all()
-
-    upcoming = db.session.query(
-        Show
-        ).filter(
-            Show.artist_id == artist_id
-        ).filter(
-            Show.start_time > datetime.now()
-        ).join(
-            Venue, 
-            Show.venue_id == Venue.id
-        ).add_columns(
-            Venue.id, 
-            Venue.name,
-            Venue.image_link,
-            Show.start_time
-        ).all()
-
-    upcoming_shows = []
-
-    past_shows = []
-
-    for show in upcoming:
-        upcoming_shows.append({
-            'venue_id': show[1],
-            'venue_name': show[2],
-            'image_link': show[3],
-            'start_time': str(show[4])
-        })
-
-    for show in past:
-        past_shows.append({
-            'venue_id': show[1],
-            'venue_name': show[2],
-            'image_link': show[3],
-            'start_time': str(show[4])
-        })
-
-    if artist is None:
+    cacheable = '_flashes' not in session
+    if cacheable:
+        page = page_cache.get('artist', artist_id)
+        if page is not None:
+            return page
+        read_from_primary()
+
+    response, upcoming = artist_details(artist_id)
+    if response is None:
         abort(404)
 
+    page = render_template('pages/show_artist.html', artist=response)
+    if cacheable:
+        page_cache.set('artist', artist_id, page, stale_at=upcoming[0][3] if upcoming else None)
+    return page
+
+def artist_details(artist_id):
+    '''
+    The artist page data with all of its shows, and the raw upcoming show
+    rows. (None, None) for an unknown artist.
+    '''
+    result = entity_with_shows(Artist, artist_id)
+    if result is None:
+        return None, None
+
+    artist, past, upcoming, past_count, upcoming_count = result
+
+    past_shows = [{
+        'venue_id': show[0],
+        'venue_name': show[1],
+        'image_link': show[2],
+        'start_time': show[3]
+    } for show in past]
+
+    upcoming_shows = [{
+        'venue_id': show[0],
+        'venue_name': show[1],
+        'image_link': show[2],
+        'start_time': show[3]
+    } for show in upcoming]
+
     response = {
         "id": artist.id,
         "name": artist.name,
-        "genres": [artist.genres],
+        "genres": artist.genres or [],
         "city": artist.city,
         "state": artist.state,
         "phone": artist.phone,
@@ -358,12 +397,13 @@ def show_artist(artist_id):
         "image_link": artist.image_link,
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past),
-        "upcoming_shows_count": len(upcoming),
+        "past_shows_count": past_count,
+        "upcoming_shows_count": upcoming_count,
     }
-    return render_template('pages/show_artist.html', artist=response)
+    return response, upcoming
 
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@primary
 def edit_artist(artist_id):
     form = ArtistForm()
     
@@ -385,7 +425,7 @@ def edit_artist_submission(artist_id):
       artist.city = request.form.get('city')
       artist.state = request.form.get('state')
       artist.phone = request.form.get('phone')
-      artist.genres= request.form.get('genres')
+      artist.genres = request.form.getlist('genres')
       artist.facebook_link = request.form.get('facebook_link')
       artist.image_link = request.form.get('image_link')
       artist.seeking_venue = bool(request.form.get('seeking_venue')=='y')
@@ -393,9 +433,14 @@ def edit_artist_submission(artist_id):
 
 
 
+      partners = touch_partners(Artist, artist_id)
+
       db.session.add(artist)
       db.session.commit()
 
+      page_cache.invalidate('artist', artist_id)
+      page_cache.invalidate('venue', *partners)
+
       flash(f"{artist.name}'s page was successfully updated!")
 
     except Exception as ex:
@@ -421,7 +466,7 @@ def create_artist_submission():
       city=request.form.get('city'),
       state=request.form.get('state'),
       phone=request.form.get('phone'),
-      genres=request.form.get('genres'),
+      genres=request.form.getlist('genres'),
       image_link=request.form.get('image_link'),
       facebook_link=request.form.get('facebook_link'),
       seeking_venue=bool(request.form.get('seeking_venue')=='y'),
@@ -441,26 +486,103 @@ def create_artist_submission():
 
 #---#SHOWS#---#
 
+def wants_json():
+    return request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
+
+def calendar_bound(name, end=False):
+    '''
+    Reads the `from` / `to` argument of the calendar: an ISO date or date
+    and time. A `to` date without a time includes that whole day.
+    '''
+    value = request.args.get(name)
+    if not value:
+        return None
+    bound = datetime.fromisoformat(value)
+    if end and len(value) == len('YYYY-MM-DD'):
+        bound += timedelta(days=1)
+    return bound
+
+def calendar_query():
+    '''
+    The shows listing query with the calendar arguments of the request
+    applied, and those arguments. Raises ValueError for bad bounds.
+    '''
+    start = calendar_bound('from')
+    end = calendar_bound('to', end=True)
+    city = request.args.get('city')
+    state = request.args.get('state')
+
+    # Only the columns the page shows, joined once: no lazy loads per row.
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+        ).join(
+            Artist, Artist.id == Show.artist_id
+        ).join(
+            Venue, Venue.id == Show.venue_id
+        )
+
+    # The window is a range on ix_shows_start_time_id, read in key order, so
+    # a page stops after `limit` rows and only those are joined. With a
+    # city or state the venues of the area come first (ix_venues_state_city)
+    # and their shows in the window from ix_shows_venue_id_start_time.
+    if start:
+        query = query.filter(Show.start_time >= start)
+    if end:
+        query = query.filter(Show.start_time < end)
+    if city:
+        query = query.filter(Venue.city == city)
+    if state:
+        query = query.filter(Venue.state == state)
+
+    return query, {
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'city': city,
+        'state': state,
+    }
+
+CALENDAR_ERROR = 'from and to must be ISO dates or times, e.g. 2026-10-24 or 2026-10-24T18:00.'
+
+def shows_json(query, window):
+    page = keyset_page(query, (Show.start_time, Show.id), page_limit(app.config))
+    return dict(window, **{
+        'shows': [{
+            'id': show.id,
+            'start_time': show.start_time,
+            'venue_id': show.venue_id,
+            'venue_name': show.venue_name,
+            'artist_id': show.artist_id,
+            'artist_name': show.artist_name,
+            'artist_image_link': show.artist_image_link
+        } for show in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
 @app.route('/shows')
 def shows():
-    data = Show.query.join(
-      Artist, 
-      Artist.id == Show.artist_id
-      ).join(
-        Venue, Venue.id == Show.venue_id
-      ).all()
+    # Calendar: /shows?from=2026-10-24&to=2026-10-25&city=Austin&state=TX
+    try:
+        query, window = calendar_query()
+    except ValueError:
+        if wants_json():
+            return jsonify({'success': False, 'message': CALENDAR_ERROR}), 400
+        abort(400, CALENDAR_ERROR)
 
-    response = []
-    for show in data:
-      response.append({
-        "venue_id": show.venue_id,
-        "venue_name": show.venue.name,
-        "artist_id": show.artist_id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": str(show.start_time)
-      })
-    return render_template('pages/shows.html', shows=response)
+    if wants_json():
+        return jsonify(shows_json(query, window))
+
+    # Rows are fetched in batches while the template streams them out.
+    page = StreamedPage(query, (Show.start_time, Show.id), page_limit(app.config),
+                        batch_size=app.config['SHOWS_STREAM_BATCH_SIZE'])
+    return stream_template('pages/shows.html', shows=page, page=page,
+                           filters=request.args)
 
 @app.route('/shows/create')
 def create_shows():
@@ -474,10 +596,12 @@ def create_show_submission():
         show = Show(
             artist_id=request.form['artist_id'],
             venue_id=request.form['venue_id'],
-            start_time=request.form['start_time']
+            start_time=counters.as_datetime(request.form['start_time'])
         )
         db.session.add(show)
         db.session.commit()
+        page_cache.invalidate('venue', request.form['venue_id'])
+        page_cache.invalidate('artist', request.form['artist_id'])
         flash('Show was successfully added!')
     except Exception as ex:
         print(ex)
@@ -488,6 +612,281 @@ def create_show_submission():
 
     return render_template('pages/home.html')
 
+@app.route('/shows/batch', methods=['POST'])
+def create_shows_batch():
+    """
+    Schedules many shows at once, e.g. a whole tour. Takes a JSON body
+    {"shows": [{"artist_id", "venue_id", "start_time"}, ...]} or a form
+    with repeated artist_id / venue_id / start_time fields. Valid rows are
+    inserted in one transaction; the response has one result per row.
+    """
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'success': False, 'message': 'Expected an object with a "shows" list.'}), 400
+        rows = body.get('shows')
+    else:
+        rows = [
+            {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time}
+            for artist_id, venue_id, start_time in zip(
+                request.form.getlist('artist_id'),
+                request.form.getlist('venue_id'),
+                request.form.getlist('start_time'))
+        ]
+
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'success': False, 'message': 'No shows given.'}), 400
+    if len(rows) > app.config['SHOWS_BATCH_MAX_SIZE']:
+        return jsonify({
+            'success': False,
+            'message': f"At most {app.config['SHOWS_BATCH_MAX_SIZE']} shows per batch."
+        }), 413
+
+    valid, rejected = [], []
+    for index, row in enumerate(rows):
+        if isinstance(row, dict):
+            values, problems = importer.validate('shows', row)
+        else:
+            values, problems = None, {'row': ['Not an object.']}
+        if problems:
+            rejected.append((index, problems))
+        else:
+            valid.append((index, values))
+
+    try:
+        connection = db.session.connection()
+        if valid:
+            valid, missing = importer.check_references(connection, valid)
+            rejected.extend(missing)
+        if valid:
+            importer.insert_shows(connection, [values for index, values in valid])
+        db.session.commit()
+    except Exception as ex:
+        print(ex)
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Shows could not be added.'}), 500
+    finally:
+        db.session.close()
+
+    page_cache.invalidate('venue', *{values['venue_id'] for index, values in valid})
+    page_cache.invalidate('artist', *{values['artist_id'] for index, values in valid})
+
+    results = [{'index': index, 'status': 'created'} for index, values in valid]
+    results += [{'index': index, 'status': 'rejected', 'errors': problems} for index, problems in rejected]
+    results.sort(key=lambda result: result['index'])
+
+    return jsonify({
+        'success': bool(valid),
+        'created': len(valid),
+        'rejected': len(rejected),
+        'results': results
+    }), 201 if valid else 400
+
+#---#API#---#
+
+'''
+Versioned JSON for the mobile client, built from the same data as the
+pages. Venue and artist resources carry a strong ETag made from their row
+version: a matching If-None-Match gets a 304 after one primary key lookup,
+before the show queries run and without serializing anything. Listings
+hash their body instead, which saves the transfer only.
+'''
+
+API_VERSION = 'v1'
+
+def api_error(status, message):
+    return jsonify({'success': False, 'message': message}), status
+
+def entity_etag(model, entity_id):
+    '''
+    Returns (exists, etag) for a venue or artist. There is no ETag while
+    the entity's next show has started but the counters have not rolled
+    over yet, as its version does not cover that change.
+    '''
+    row = db.session.query(model.version, model.next_show_time).filter(model.id == entity_id).first()
+    if row is None:
+        return False, None
+    if row.next_show_time is not None and row.next_show_time <= datetime.now():
+        return True, None
+    return True, f'{API_VERSION}-{model.__tablename__}-{entity_id}-{row.version}'
+
+def revalidated(response):
+    # Clients may keep the response but have to check it is current.
+    response.cache_control.no_cache = True
+    return response
+
+def entity_response(model, entity_id, details):
+    exists, etag = entity_etag(model, entity_id)
+    if not exists:
+        return api_error(404, 'Resource not found')
+    if etag and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return revalidated(response)
+
+    data, upcoming = details(entity_id)
+    if data is None:
+        return api_error(404, 'Resource not found')
+    response = jsonify(data)
+    if etag:
+        response.set_etag(etag)
+    return revalidated(response)
+
+def listing_response(data):
+    response = jsonify(data)
+    response.add_etag()
+    return revalidated(response.make_conditional(request))
+
+@app.route(f'/api/{API_VERSION}/venues')
+def api_venues():
+    areas, page, genre = venues_page()
+    return listing_response({
+        'areas': areas,
+        'genre': genre,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
+@app.route(f'/api/{API_VERSION}/venues/<int:venue_id>')
+@primary
+def api_venue(venue_id):
+    return entity_response(Venue, venue_id, venue_details)
+
+@app.route(f'/api/{API_VERSION}/artists')
+def api_artists():
+    page, genre = artists_page()
+    return listing_response({
+        'artists': [{'id': artist.id, 'name': artist.name} for artist in page.items],
+        'genre': genre,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    })
+
+@app.route(f'/api/{API_VERSION}/artists/<int:artist_id>')
+@primary
+def api_artist(artist_id):
+    return entity_response(Artist, artist_id, artist_details)
+
+@app.route(f'/api/{API_VERSION}/shows')
+def api_shows():
+    try:
+        query, window = calendar_query()
+    except ValueError:
+        return api_error(400, CALENDAR_ERROR)
+    return listing_response(shows_json(query, window))
+
+#---#INTERNAL#---#
+
+@app.route('/_internal/cache')
+def cache_status():
+    return jsonify(page_cache.stats())
+
+@app.route('/_internal/pool')
+def pool_status_report():
+    return jsonify(pool_status(db.engine))
+
+@app.route('/_internal/replicas')
+def replica_status_report():
+    engines = db.engines
+    return jsonify({
+        key: dict(health, pool=pool_status(engines[key]))
+        for key, health in replicas.status().items()
+    })
+
+@app.route('/_internal/sql')
+def sql_profile_report():
+    if not app.config['SQL_PROFILER_ENABLED']:
+        abort(404)
+    return jsonify({'slowest_requests': sql_profiler.report()})
+
+#---#COMMANDS#---#
+
+counters_cli = AppGroup('counters', help='Maintain the show counters on venues and artists.')
+
+@counters_cli.command('rollover')
+def counters_rollover():
+    """Move shows that have started from upcoming to past. Run it from cron."""
+    with db.engine.begin() as connection:
+        updated = counters.roll_over(connection)
+    with db.engine.begin() as connection:
+        refresh_areas(connection)
+    print(f'{updated} venues/artists rolled over')
+
+@counters_cli.command('reconcile')
+def counters_reconcile():
+    """Recompute every counter from the shows table."""
+    with db.engine.begin() as connection:
+        updated = counters.reconcile(connection)
+    with db.engine.begin() as connection:
+        refresh_areas(connection)
+    print(f'{updated} venues/artists reconciled')
+
+app.cli.add_command(counters_cli)
+
+areas_cli = AppGroup('areas', help='Maintain the venue area summary of the venues page.')
+
+@areas_cli.command('refresh')
+@click.option('--all', 'everything', is_flag=True, help='Rebuild every area, not just the dirty ones.')
+def areas_refresh(everything):
+    """Bring the venue area summary up to date."""
+    with db.engine.begin() as connection:
+        refreshed = rebuild_areas(connection) if everything else refresh_areas(connection)
+    print(f'{refreshed} areas refreshed')
+
+app.cli.add_command(areas_cli)
+
+partitions_cli = AppGroup('partitions', help='Maintain the monthly partitions of shows (Postgres).')
+
+def partitioned_connection(connection):
+    if not partitions.is_partitioned(connection):
+        raise click.ClickException('shows is not partitioned, see `flask db upgrade -x partition_shows=true`')
+    return connection
+
+@partitions_cli.command('create')
+@click.option('--months-ahead', default=12, show_default=True, help='Months after the current one to cover.')
+def partitions_create(months_ahead):
+    """Create the partitions of the coming months. Run it from cron."""
+    with db.engine.begin() as connection:
+        created = partitions.create_partitions(partitioned_connection(connection), months_ahead)
+    print(f'{len(created)} partitions created {" ".join(created)}'.rstrip())
+
+@partitions_cli.command('archive')
+@click.option('--before', required=True, type=click.DateTime(formats=['%Y-%m']),
+              help='Detach the months before this one (YYYY-MM).')
+def partitions_archive(before):
+    """Detach the partitions of past months from shows."""
+    with db.engine.begin() as connection:
+        detached, venue_ids, artist_ids = partitions.archive_partitions(
+            partitioned_connection(connection), before.date())
+    with db.engine.begin() as connection:
+        refresh_areas(connection)
+    page_cache.invalidate('venue', *venue_ids)
+    page_cache.invalidate('artist', *artist_ids)
+    print(f'{len(detached)} partitions detached {" ".join(detached)}'.rstrip())
+
+app.cli.add_command(partitions_cli)
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(importer.KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per transaction.')
+@click.option('--checkpoint', help='Checkpoint file. Defaults to PATH.checkpoint.')
+@click.option('--errors', help='Rejected rows report. Defaults to PATH.errors.ndjson.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the top.')
+def import_command(kind, path, batch_size, checkpoint, errors, restart):
+    """Bulk load venues, artists or shows from a CSV or NDJSON file."""
+
+    def invalidate_pages(kind, rows):
+        if kind == 'shows':
+            page_cache.invalidate('venue', *{row['venue_id'] for row in rows})
+            page_cache.invalidate('artist', *{row['artist_id'] for row in rows})
+
+    summary = importer.import_file(kind, path, batch_size, checkpoint, errors, restart,
+                                   on_batch=invalidate_pages)
+    with db.engine.begin() as connection:
+        refresh_areas(connection)
+    print(json.dumps(summary))
+
 #---#ERRORS#---#
 
 @app.errorhandler(404)
@@ -0,0 +1,173 @@
+'''
+Seeded synthetic Fyyur data for the benchmarks.
+
+The same seed and sizes always give the same rows, so runs on different
+commits measure the same dataset. Rows go in through importer.insert_batch
+(COPY on Postgres, executemany elsewhere) and the show counters are
+reconciled once at the end.
+
+    python benchmarks/dataset.py --url sqlite:///bench.db --venues 10000 --artists 50000 --shows 1000000
+
+The target database is wiped.
+'''
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forms import VenueForm
+from database.models import Artist, Venue, Show, db
+from database import counters
+from database.areas import rebuild_areas
+import database.search  # registers the search DDL on the tables
+from importer import insert_batch
+
+STATES = [value for value, label in VenueForm.state.kwargs['choices']]
+GENRES = [value for value, label in VenueForm.genres.kwargs['choices']]
+CITIES = 200
+WORDS = [
+    'Blue', 'Red', 'Golden', 'Velvet', 'Iron', 'Silver', 'Wild', 'Electric',
+    'Midnight', 'Crimson', 'Lucky', 'Hollow', 'Neon', 'Rolling', 'Broken',
+    'Echo', 'Harbor', 'Moon', 'Sparrow', 'Canyon', 'Lantern', 'Fox', 'River',
+]
+
+# Shows are spread over this many days either side of the generation time.
+SHOW_SPREAD_DAYS = 365
+
+
+def name(rng, suffix):
+    return f'{rng.choice(WORDS)} {rng.choice(WORDS)} {suffix}'
+
+
+def area(rng):
+    '''
+    Cities are skewed so some areas are much busier than others, like
+    real listings.
+    '''
+    city = int(rng.paretovariate(1.2)) % CITIES
+    return f'City {city}', STATES[city % len(STATES)]
+
+
+def venue_row(rng, venue_id):
+    city, state = area(rng)
+    return {
+        'id': venue_id,
+        'name': name(rng, 'Hall'),
+        'city': city,
+        'state': state,
+        'address': f'{rng.randint(1, 9999)} {rng.choice(WORDS)} St',
+        'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+        'genres': rng.sample(GENRES, rng.randint(1, 3)),
+        'image_link': f'https://images.example.com/venues/{venue_id}.jpg',
+        'facebook_link': f'https://www.facebook.com/venue{venue_id}',
+        'website': f'https://venue{venue_id}.example.com',
+        'seeking_talent': rng.random() < 0.3,
+        'seeking_description': 'Looking for local bands',
+    }
+
+
+def artist_row(rng, artist_id):
+    city, state = area(rng)
+    return {
+        'id': artist_id,
+        'name': name(rng, 'Band'),
+        'city': city,
+        'state': state,
+        'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+        'genres': rng.sample(GENRES, rng.randint(1, 3)),
+        'image_link': f'https://images.example.com/artists/{artist_id}.jpg',
+        'facebook_link': f'https://www.facebook.com/artist{artist_id}',
+        'website': f'https://artist{artist_id}.example.com',
+        'seeking_venue': rng.random() < 0.3,
+        'seeking_description': 'Looking for shows',
+    }
+
+
+def show_row(rng, show_id, venues, artists, now):
+    return {
+        'id': show_id,
+        'venue_id': rng.randint(1, venues),
+        'artist_id': rng.randint(1, artists),
+        'start_time': now + timedelta(minutes=30 * rng.randint(-48 * SHOW_SPREAD_DAYS, 48 * SHOW_SPREAD_DAYS)),
+    }
+
+
+def insert_rows(connection, table, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            insert_batch(connection, table, batch)
+            batch = []
+    if batch:
+        insert_batch(connection, table, batch)
+
+
+def generate(engine, venues, artists, shows, seed=1, batch_size=10000, now=None, log=print):
+    '''
+    Recreates the schema on `engine` and fills it. Returns a summary dict
+    describing the dataset.
+    '''
+    rng = random.Random(seed)
+    # Rounded so two runs on the same day produce the same rows.
+    now = now or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    started = time.perf_counter()
+
+    with engine.begin() as connection:
+        db.metadata.drop_all(connection)
+        db.metadata.create_all(connection)
+
+    for label, model, rows in (
+        ('venues', Venue, (venue_row(rng, i) for i in range(1, venues + 1))),
+        ('artists', Artist, (artist_row(rng, i) for i in range(1, artists + 1))),
+        ('shows', Show, (show_row(rng, i, venues, artists, now) for i in range(1, shows + 1))),
+    ):
+        log(f'inserting {label}')
+        with engine.begin() as connection:
+            insert_rows(connection, model.__table__, rows, batch_size)
+
+    log('reconciling show counters and venue areas')
+    with engine.begin() as connection:
+        counters.reconcile(connection)
+        rebuild_areas(connection)
+        if connection.dialect.name == 'postgresql':
+            for model in (Venue, Artist, Show):
+                connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+                    f"coalesce((SELECT max(id) FROM {model.__tablename__}), 1))"
+                ))
+        connection.execute(text('ANALYZE'))
+
+    return {
+        'venues': venues,
+        'artists': artists,
+        'shows': shows,
+        'seed': seed,
+        'generated_at': now.isoformat(),
+        'seconds': round(time.perf_counter() - started, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL'), required='DATABASE_URL' not in os.environ)
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=50000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    summary = generate(create_engine(args.url), args.venues, args.artists, args.shows,
+                       seed=args.seed, batch_size=args.batch_size)
+    print(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+Micro-benchmark of the `datetime` template filter.
+
+Compares the old filter (str() the datetime in the route, re-parse it
+with dateutil and let babel parse the pattern on every call) with
+filters.format_datetime on native datetimes.
+
+    python benchmarks/datetime_filter.py --count 100000
+'''
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import format_datetime
+
+
+def old_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def measure(label, function, values, format):
+    start = time.perf_counter()
+    for value in values:
+        function(value, format)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<40} {elapsed:8.3f} s  {elapsed / len(values) * 1e6:8.2f} us/value')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--format', default='full')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now()
+    values = [now + timedelta(minutes=rng.randint(-10 ** 6, 10 ** 6)) for _ in range(args.count)]
+    strings = [str(value) for value in values]
+
+    assert old_format_datetime(strings[0], args.format) == format_datetime(values[0], args.format)
+
+    old = measure('old: str() + dateutil + babel', old_format_datetime, strings, args.format)
+    new = measure('new: native datetime + cached pattern', format_datetime, values, args.format)
+    print(f'speedup: {old / new:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
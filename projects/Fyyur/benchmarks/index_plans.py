@@ -0,0 +1,137 @@
+'''
+Before/after query plans and timings for the shows and listing indexes.
+
+Seeds a throwaway database, runs the hot Fyyur queries without the
+indexes, builds the indexes and runs them again.
+
+    python benchmarks/index_plans.py --url postgresql://localhost/fyyur_bench
+    python benchmarks/index_plans.py --venues 2000 --artists 5000 --shows 200000
+
+Defaults to a temporary SQLite file. The target database is wiped.
+'''
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import Artist, Venue, Show, db
+
+INDEXED_TABLES = (Venue.__table__, Artist.__table__, Show.__table__)
+
+QUERIES = {
+    'venue upcoming shows': (
+        'SELECT artist_id, start_time FROM shows '
+        'WHERE venue_id = :venue_id AND start_time > :now ORDER BY start_time'
+    ),
+    'artist past shows': (
+        'SELECT venue_id, start_time FROM shows '
+        'WHERE artist_id = :artist_id AND start_time < :now ORDER BY start_time'
+    ),
+    'venues in area': (
+        'SELECT id, name FROM venues WHERE state = :state AND city = :city ORDER BY id'
+    ),
+    'artist by name': (
+        'SELECT id FROM artists WHERE name = :name'
+    ),
+}
+
+
+def seed(connection, venues, artists, shows, rng):
+    now = datetime.now()
+    connection.execute(Venue.__table__.insert(), [{
+        'id': i,
+        'name': f'Venue {i}',
+        'city': f'City {i % 50}',
+        'state': 'NY' if i % 2 else 'CA',
+    } for i in range(1, venues + 1)])
+    connection.execute(Artist.__table__.insert(), [{
+        'id': i,
+        'name': f'Artist {i}',
+    } for i in range(1, artists + 1)])
+    batch = []
+    for i in range(1, shows + 1):
+        batch.append({
+            'id': i,
+            'venue_id': rng.randint(1, venues),
+            'artist_id': rng.randint(1, artists),
+            'start_time': now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+        })
+        if len(batch) == 10000:
+            connection.execute(Show.__table__.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(Show.__table__.insert(), batch)
+
+
+def plan(connection, sql, params):
+    if connection.dialect.name == 'postgresql':
+        rows = connection.execute(text('EXPLAIN ANALYZE ' + sql), params)
+        return [row[0] for row in rows]
+    rows = connection.execute(text('EXPLAIN QUERY PLAN ' + sql), params)
+    return [row[-1] for row in rows]
+
+
+def timing(connection, sql, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        connection.execute(text(sql), params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(connection, label, params, repeat):
+    print(f'\n=== {label} ===')
+    for name, sql in QUERIES.items():
+        print(f'\n-- {name}: {timing(connection, sql, params, repeat):.3f} ms')
+        for line in plan(connection, sql, params):
+            print(f'   {line}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default=None)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(url)
+    rng = random.Random(args.seed)
+
+    with engine.begin() as connection:
+        db.metadata.drop_all(connection, tables=INDEXED_TABLES)
+        db.metadata.create_all(connection, tables=INDEXED_TABLES)
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                index.drop(connection)
+        seed(connection, args.venues, args.artists, args.shows, rng)
+
+    params = {
+        'venue_id': rng.randint(1, args.venues),
+        'artist_id': rng.randint(1, args.artists),
+        'now': datetime.now(),
+        'state': 'NY',
+        'city': 'City 7',
+        'name': f'Artist {rng.randint(1, args.artists)}',
+    }
+
+    with engine.begin() as connection:
+        run(connection, 'without indexes', params, args.repeat)
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                index.create(connection)
+        connection.execute(text('ANALYZE'))
+        run(connection, 'with indexes', params, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
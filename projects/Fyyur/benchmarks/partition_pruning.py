@@ -0,0 +1,172 @@
+'''
+Partition pruning of the show queries, before and after partitioning.
+
+Generates a seeded dataset (see dataset.py) on Postgres, records the SQL
+the app sends for a venue page, an artist page and a week of the shows
+calendar, and runs EXPLAIN (ANALYZE, BUFFERS) on it against the plain
+shows table. It then converts shows to monthly partitions with the
+partition_shows migration and explains the same statements again.
+
+    python benchmarks/partition_pruning.py --url postgresql://localhost/fyyur_bench \
+        --venues 10000 --artists 50000 --shows 1000000
+
+Per query and layout the JSON lists the shows tables scanned, the
+buffers touched and the median planning and execution times. The target
+database is wiped.
+'''
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(ROOT)), 'migrations', 'versions',
+                         'a7d2e4b9c613_partition_shows.py')
+
+
+def capture(app, engine, path):
+    '''
+    (statement, parameters) of every query of GET `path` that reads shows.
+    '''
+    from sqlalchemy import event
+
+    captured = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if 'shows' in statement and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = app.test_client(use_cookies=False).get(path)
+        response.get_data()
+        if response.status_code != 200:
+            raise SystemExit(f'GET {path} answered {response.status_code}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return captured
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def explain(engine, statement, parameters, repeat):
+    plans = []
+    with engine.connect() as connection:
+        for _ in range(repeat):
+            plans.append(connection.exec_driver_sql(
+                'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement, parameters
+            ).scalar()[0])
+    nodes = list(plan_nodes(plans[-1]['Plan']))
+    return {
+        'tables': sorted({node['Relation Name'] for node in nodes
+                          if node.get('Relation Name', '').startswith('shows')}),
+        'subplans_removed': sum(node.get('Subplans Removed', 0) for node in nodes),
+        'shared_buffers': plans[-1]['Plan'].get('Shared Hit Blocks', 0) + plans[-1]['Plan'].get('Shared Read Blocks', 0),
+        'planning_ms': round(statistics.median(plan['Planning Time'] for plan in plans), 3),
+        'execution_ms': round(statistics.median(plan['Execution Time'] for plan in plans), 3),
+    }
+
+
+def report(engine, queries, repeat):
+    return {
+        name: [explain(engine, statement, parameters, repeat) for statement, parameters in statements]
+        for name, statements in queries.items()
+    }
+
+
+def partition(engine):
+    '''
+    Runs the opt-in migration on the generated database.
+    '''
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from sqlalchemy import text
+
+    spec = importlib.util.spec_from_file_location('partition_shows', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    os.environ['FYYUR_PARTITION_SHOWS'] = 'true'
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+    with engine.begin() as connection:
+        connection.execute(text('ANALYZE'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL'), required='DATABASE_URL' not in os.environ)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5, help='EXPLAIN ANALYZE runs per query')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+
+    # config.py reads the environment on import, so this goes first.
+    os.environ['DATABASE_URL'] = args.url
+    os.environ['PAGE_CACHE_TTL'] = '0'
+
+    from app import app, db, Venue, Artist
+    from benchmarks.dataset import generate
+    from database.partitions import partitions
+
+    log = lambda message: print(message, file=sys.stderr)
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'postgresql':
+            raise SystemExit('partitioning needs Postgres, pass a postgresql:// --url')
+        dataset = generate(engine, args.venues, args.artists, args.shows, seed=args.seed, log=log)
+        # the busiest venue and artist, the pages pruning helps most
+        venue_id = db.session.query(Venue.id).order_by(
+            (Venue.upcoming_shows_count + Venue.past_shows_count).desc()).limit(1).scalar()
+        artist_id = db.session.query(Artist.id).order_by(
+            (Artist.upcoming_shows_count + Artist.past_shows_count).desc()).limit(1).scalar()
+        db.session.remove()
+
+        today = datetime.now().date()
+        week = f'from={today}&to={today + timedelta(days=6)}'
+        queries = {
+            f'GET /venues/{venue_id}': capture(app, engine, f'/venues/{venue_id}'),
+            f'GET /artists/{artist_id}': capture(app, engine, f'/artists/{artist_id}'),
+            f'GET /shows?{week}': capture(app, engine, f'/shows?{week}'),
+        }
+        # The requests shared this app context, so their session is still
+        # open and its transaction would block the conversion.
+        db.session.remove()
+
+        log('explaining on the plain table')
+        before = report(engine, queries, args.repeat)
+        log('partitioning shows')
+        partition(engine)
+        with engine.connect() as connection:
+            count = len(partitions(connection))
+        log('explaining on the partitions')
+        after = report(engine, queries, args.repeat)
+
+    output = json.dumps({
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'dataset': dataset,
+        'repeat': args.repeat,
+        'monthly_partitions': count,
+        'queries': {name: {'plain': before[name], 'partitioned': after[name]} for name in queries},
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
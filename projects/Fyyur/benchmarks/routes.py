@@ -0,0 +1,300 @@
+'''
+Latency and query counts for every Fyyur route.
+
+Generates a seeded dataset (see dataset.py), then drives each route of
+app.py through the Flask test client and prints, per route, the p50/p99
+latency and the number of SQL statements as JSON. Keep the JSON of two
+commits and diff them to compare.
+
+    python benchmarks/routes.py --output before.json
+    DATABASE_URL=postgresql://localhost/fyyur_bench python benchmarks/routes.py \
+        --venues 10000 --artists 50000 --shows 1000000 --output after.json
+    python benchmarks/routes.py --url postgresql://localhost/fyyur_bench --reuse
+
+The database comes from --url or DATABASE_URL and defaults to a temporary
+SQLite file; config.py's default URI is never used. Unless --reuse is
+given the database is wiped and regenerated. The page cache is off so the
+detail pages measure the database, pass --page-cache to keep it on.
+Write routes change the data, so reuse a database only across runs of
+this script. Exits with 1 if any route answered with a 5xx.
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, q):
+    '''
+    Nearest-rank percentile of a non empty list.
+    '''
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def form_of(row, website_field):
+    '''
+    Turns a dataset row into the form the create/edit pages post.
+    '''
+    data = {key: value for key, value in row.items()
+            if key not in ('id', 'website', 'seeking_talent', 'seeking_venue')}
+    data[website_field] = row['website']
+    for flag in ('seeking_talent', 'seeking_venue'):
+        if row.get(flag):
+            data[flag] = 'y'
+    return data
+
+
+def scenarios(context, app):
+    '''
+    (name, request builder) for every route. A builder takes a Random and
+    returns (method, path, test client keyword arguments), it runs before
+    the request is timed. Read routes come
+    first, then the routes that write, with the deletes last so they can
+    remove the venues created before them.
+    '''
+    from benchmarks.dataset import WORDS, artist_row, venue_row
+    from database.pagination import encode_cursor
+
+    venue = lambda rng: rng.randint(1, context['venues'])
+    artist = lambda rng: rng.randint(1, context['artists'])
+    start_time = lambda rng: (datetime.now() + timedelta(days=rng.randint(1, 365))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def new_show(rng):
+        return {'artist_id': artist(rng), 'venue_id': venue(rng), 'start_time': start_time(rng)}
+
+    def calendar_window(rng):
+        # a weekend in one of the busier cities
+        day = datetime.now().date() + timedelta(days=rng.randint(0, 300))
+        return {'from': day.isoformat(), 'to': (day + timedelta(days=2)).isoformat(),
+                'city': f'City {rng.randint(1, 5)}'}
+
+    def revalidate(path):
+        etag = app.test_client(use_cookies=False).get(path).headers.get('ETag')
+        return ('get', path, {'headers': {'If-None-Match': etag or ''}})
+
+    def spare_venue(rng):
+        # venues added by POST /venues/create, they have no shows
+        return f'/venues/{context["created_venues"].pop() if context["created_venues"] else 0}'
+
+    return [
+        ('GET /', lambda rng: ('get', '/', {})),
+        ('GET /venues', lambda rng: ('get', '/venues', {})),
+        ('GET /venues (deep page)', lambda rng: ('get', '/venues', {
+            'query_string': {'after': encode_cursor(context['venue_key'])}})),
+        ('GET /venues?genre', lambda rng: ('get', '/venues', {
+            'query_string': {'genre': 'Jazz'}})),
+        ('GET /venues/<id>', lambda rng: ('get', f'/venues/{venue(rng)}', {})),
+        ('GET /venues/create', lambda rng: ('get', '/venues/create', {})),
+        ('GET /venues/<id>/edit', lambda rng: ('get', f'/venues/{venue(rng)}/edit', {})),
+        ('POST /venues/search', lambda rng: ('post', '/venues/search', {
+            'data': {'search_term': rng.choice(WORDS).lower()[:3]}})),
+        ('GET /artists', lambda rng: ('get', '/artists', {})),
+        ('GET /artists (deep page)', lambda rng: ('get', '/artists', {
+            'query_string': {'after': encode_cursor([context['artists'] // 2])}})),
+        ('GET /artists?genre', lambda rng: ('get', '/artists', {
+            'query_string': {'genre': 'Jazz'}})),
+        ('GET /artists/<id>', lambda rng: ('get', f'/artists/{artist(rng)}', {})),
+        ('GET /artists/create', lambda rng: ('get', '/artists/create', {})),
+        ('GET /artists/<id>/edit', lambda rng: ('get', f'/artists/{artist(rng)}/edit', {})),
+        ('POST /artists/search', lambda rng: ('post', '/artists/search', {
+            'data': {'search_term': rng.choice(WORDS).lower()[:3]}})),
+        ('GET /shows', lambda rng: ('get', '/shows', {})),
+        ('GET /shows (deep page)', lambda rng: ('get', '/shows', {
+            'query_string': {'after': encode_cursor(context['show_key'])}})),
+        ('GET /shows?from&to&city', lambda rng: ('get', '/shows', {
+            'query_string': calendar_window(rng)})),
+        ('GET /shows?from&to (json)', lambda rng: ('get', '/shows', {
+            'query_string': dict(calendar_window(rng), city=None, format='json')})),
+        ('GET /shows/create', lambda rng: ('get', '/shows/create', {})),
+        ('GET /api/v1/venues', lambda rng: ('get', '/api/v1/venues', {})),
+        ('GET /api/v1/venues/<id>', lambda rng: ('get', f'/api/v1/venues/{venue(rng)}', {})),
+        ('GET /api/v1/venues/<id> (304)', lambda rng: revalidate(f'/api/v1/venues/{venue(rng)}')),
+        ('GET /api/v1/artists', lambda rng: ('get', '/api/v1/artists', {})),
+        ('GET /api/v1/artists/<id>', lambda rng: ('get', f'/api/v1/artists/{artist(rng)}', {})),
+        ('GET /api/v1/artists/<id> (304)', lambda rng: revalidate(f'/api/v1/artists/{artist(rng)}')),
+        ('GET /api/v1/shows', lambda rng: ('get', '/api/v1/shows', {
+            'query_string': dict(calendar_window(rng), city=None)})),
+        ('GET /_internal/cache', lambda rng: ('get', '/_internal/cache', {})),
+        ('GET /_internal/pool', lambda rng: ('get', '/_internal/pool', {})),
+        ('GET /_internal/replicas', lambda rng: ('get', '/_internal/replicas', {})),
+        ('GET /_internal/sql', lambda rng: ('get', '/_internal/sql', {})),
+        ('POST /venues/create', lambda rng: ('post', '/venues/create', {
+            'data': form_of(venue_row(rng, None), 'website_link')})),
+        ('POST /venues/<id>/edit', lambda rng: ('post', f'/venues/{venue(rng)}/edit', {
+            'data': form_of(venue_row(rng, None), 'website_link')})),
+        ('POST /artists/create', lambda rng: ('post', '/artists/create', {
+            'data': form_of(artist_row(rng, None), 'website')})),
+        ('POST /artists/<id>/edit', lambda rng: ('post', f'/artists/{artist(rng)}/edit', {
+            'data': form_of(artist_row(rng, None), 'website')})),
+        ('POST /shows/create', lambda rng: ('post', '/shows/create', {'data': new_show(rng)})),
+        ('POST /shows/batch', lambda rng: ('post', '/shows/batch', {
+            'json': {'shows': [new_show(rng) for _ in range(context['batch_rows'])]}})),
+        ('DELETE /venues/<id>', lambda rng: ('delete', spare_venue(rng), {})),
+    ]
+
+
+def dataset_context(db, Venue, VenueArea, Artist, Show):
+    '''
+    Sizes and mid-listing cursor keys of whatever is in the database.
+    '''
+    count = lambda model: db.session.query(db.func.max(model.id)).scalar() or 0
+    shows = db.session.query(Show.start_time, Show.id).order_by(Show.start_time, Show.id)
+    show_key = shows.offset(db.session.query(Show.id).count() // 2).first()
+    area = db.session.query(VenueArea.state, VenueArea.city, VenueArea.venues).order_by(
+        VenueArea.state, VenueArea.city
+    ).offset(db.session.query(VenueArea.state).count() // 2).first()
+    # the summary pages on venues, (state, city, id)
+    venue_key = (area.state, area.city, area.venues[0]['id']) if area and area.venues else None
+    return {
+        'venues': count(Venue),
+        'artists': count(Artist),
+        'show_key': list(show_key) if show_key else [datetime.now(), 0],
+        'venue_key': list(venue_key) if venue_key else ['', '', 0],
+        'created_venues': [],
+    }
+
+
+def measure(app, engines, rng, builder, requests, warmup):
+    from sqlalchemy import event
+
+    statements = []
+    count_statement = lambda *args: statements.append(1)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        timings, queries, statuses = [], [], Counter()
+        for number in range(warmup + requests):
+            method, path, kwargs = builder(rng)
+            # A fresh client per request, so flashed messages do not pile
+            # up in the session and change what the next request renders.
+            client = app.test_client(use_cookies=False)
+            statements.clear()
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            response.get_data()  # drains streamed responses
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            response.close()
+            if number < warmup:
+                continue
+            timings.append(elapsed_ms)
+            queries.append(len(statements))
+            statuses[response.status_code] += 1
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count_statement)
+
+    return {
+        'requests': requests,
+        'status': {str(code): count for code, count in sorted(statuses.items())},
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries_p50': percentile(queries, 0.5),
+        'queries_max': max(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--reuse', action='store_true', help='keep the data already in the database')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=50, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests per route')
+    parser.add_argument('--batch-rows', type=int, default=20, help='shows per POST /shows/batch')
+    parser.add_argument('--route', action='append', help='only run routes whose name contains this')
+    parser.add_argument('--page-cache', action='store_true')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+
+    # config.py reads the environment on import, so this goes first.
+    url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'fyyur_bench.db')
+    os.environ['DATABASE_URL'] = url
+    if not args.page_cache:
+        os.environ['PAGE_CACHE_TTL'] = '0'
+
+    from app import app, db, Venue, VenueArea, Artist, Show
+    from benchmarks.dataset import generate
+
+    log = lambda message: print(message, file=sys.stderr)
+    with app.app_context():
+        engine = db.engine
+        dataset = None
+        if not args.reuse:
+            dataset = generate(engine, args.venues, args.artists, args.shows,
+                               seed=args.seed, log=log)
+        context = dataset_context(db, Venue, VenueArea, Artist, Show)
+        context['batch_rows'] = args.batch_rows
+        seeded_venues = context['venues']
+        db.session.remove()
+
+    rng = random.Random(args.seed)
+    results = {}
+    for name, builder in scenarios(context, app):
+        if args.route and not any(part in name for part in args.route):
+            continue
+        if name.startswith('DELETE'):
+            with app.app_context():
+                context['created_venues'] = [row[0] for row in db.session.query(Venue.id).filter(
+                    Venue.id > seeded_venues, Venue.upcoming_shows_count == 0, Venue.past_shows_count == 0
+                )]
+                db.session.remove()
+        log(f'{name} ...')
+        with app.app_context():
+            results[name] = measure(app, db.engines.values(), rng, builder, args.requests, args.warmup)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'database': engine.dialect.name,
+        'python': platform.python_version(),
+        'dataset': dataset or {'venues': context['venues'], 'artists': context['artists'], 'reused': True},
+        'settings': {
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'page_cache': args.page_cache,
+        },
+        'routes': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+    failed = [name for name, result in results.items()
+              if any(code.startswith('5') for code in result['status'])]
+    if failed:
+        log('5xx responses from: ' + ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
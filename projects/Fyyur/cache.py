@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+#---#PAGE CACHE#---#
+
+'''
+Rendered page cache for the venue and artist detail pages.
+
+Entries are keyed by (kind, entity id) and dropped by the handlers that
+change what the page shows. Every entry also expires after a TTL, or
+earlier when the first upcoming show on the page starts and would have to
+move to the past shows.
+'''
+
+
+class LRUBackend:
+    '''
+    In-process LRU, the default. Each worker keeps its own copy.
+    '''
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def size(self):
+        return len(self.entries)
+
+
+class RedisBackend:
+    '''
+    Shared Redis backend so every worker sees the same entries and the
+    same invalidations. Needs the `redis` package.
+    '''
+
+    def __init__(self, url, prefix='fyyur:page:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('PAGE_CACHE_BACKEND=redis needs the redis package installed')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def key(self, key):
+        return self.prefix + ':'.join(str(part) for part in key)
+
+    def get(self, key):
+        value = self.client.get(self.key(key))
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.key(key), value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.key(key))
+
+    def size(self):
+        return None
+
+
+class PageCache:
+
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        if app.config['PAGE_CACHE_BACKEND'] == 'redis':
+            self.backend = RedisBackend(app.config['PAGE_CACHE_REDIS_URL'])
+        else:
+            self.backend = LRUBackend(app.config['PAGE_CACHE_MAX_ENTRIES'])
+        self.ttl = app.config['PAGE_CACHE_TTL']
+
+    def get(self, kind, entity_id):
+        value = self.backend.get((kind, entity_id))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, kind, entity_id, value, stale_at=None):
+        '''
+        Stores a rendered page. `stale_at` is when the page stops being
+        right on its own (the next upcoming show starts); the entry never
+        outlives it.
+        '''
+        ttl = self.ttl
+        if stale_at is not None:
+            ttl = min(ttl, (stale_at - datetime.now()).total_seconds())
+        if ttl > 0:
+            self.backend.set((kind, entity_id), value, ttl)
+
+    def invalidate(self, kind, *entity_ids):
+        for entity_id in entity_ids:
+            self.backend.delete((kind, int(entity_id)))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None,
+            'entries': self.backend.size(),
+            'ttl': self.ttl,
+        }
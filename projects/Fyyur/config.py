@@ -7,8 +7,74 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://postgres:!@localhost:5432/Fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Connection pool. Size it to the worker count: every worker thread can hold
+# one connection, DB_MAX_OVERFLOW more are opened under bursts.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# Milliseconds, 0 disables. Postgres only.
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+# Log checkouts that wait longer than this many milliseconds for a connection
+DB_POOL_SLOW_WAIT_MS = float(os.environ.get('DB_POOL_SLOW_WAIT_MS', 100))
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres:!@localhost:5432/Fyyur'
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    # SQLite picks its own pool, local runs and tests only
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+else:
+    from database.pool import TimedQueuePool
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': TimedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT and SQLALCHEMY_DATABASE_URI.startswith('postgres'):
+        SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {
+            'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'
+        }
+
+# Read replicas, comma separated URLs. Read-only requests are spread over
+# them (database/routing.py); each becomes a replica_<n> bind.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+SQLALCHEMY_BINDS = {f'replica_{number}': url for number, url in enumerate(DATABASE_REPLICA_URLS)}
+# Seconds a failed replica is skipped before it is tried again
+DB_REPLICA_RETRY_SECONDS = int(os.environ.get('DB_REPLICA_RETRY_SECONDS', 30))
+# Seconds a client reads from the primary after writing, covers replica lag
+DB_READ_AFTER_WRITE_SECONDS = int(os.environ.get('DB_READ_AFTER_WRITE_SECONDS', 5))
+
+# The venues page reads the venue_areas summary, which may lag behind the
+# venues by at most this many seconds (database/areas.py)
+VENUE_AREAS_MAX_STALENESS = int(os.environ.get('VENUE_AREAS_MAX_STALENESS', 15))
+
+# Number of results per page on the venue and artist search pages
+SEARCH_PAGE_SIZE = 20
+
+# Keyset pagination of the venue, artist and show listings
+LISTING_PAGE_SIZE = 50
+LISTING_MAX_PAGE_SIZE = 200
+
+# Rows fetched per round trip while the shows page streams
+SHOWS_STREAM_BATCH_SIZE = 100
+
+# Most shows accepted by one POST /shows/batch
+SHOWS_BATCH_MAX_SIZE = 1000
+
+# Per-request SQL profiler: Server-Timing headers, N+1 warnings and the
+# slowest requests at /_internal/sql. Off by default.
+SQL_PROFILER_ENABLED = os.environ.get('SQL_PROFILER_ENABLED', 'false').lower() == 'true'
+SQL_PROFILER_REPEAT_THRESHOLD = int(os.environ.get('SQL_PROFILER_REPEAT_THRESHOLD', 10))
+SQL_PROFILER_KEEP = int(os.environ.get('SQL_PROFILER_KEEP', 50))
+
+# Rendered page cache for the venue and artist detail pages.
+# PAGE_CACHE_BACKEND is 'memory' (per worker LRU) or 'redis' (shared).
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+PAGE_CACHE_REDIS_URL = os.environ.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1000))
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 300))
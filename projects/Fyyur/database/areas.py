@@ -0,0 +1,269 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby, islice
+
+from flask import request
+from sqlalchemy import event, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import Venue, VenueArea, db
+from .pagination import decode_cursor, make_page
+
+#---#AREA SUMMARY#---#
+
+'''
+venue_areas keeps one row per (state, city) with the area's venues and
+their upcoming show counts, so the venues page is one keyset read over its
+primary key and never aggregates venues. Pages are cut at venues, not
+areas: the cursor is a venue's (state, city, id), so a busy area can span
+several pages.
+
+Anything that changes what an area lists (a venue added, renamed, moved or
+deleted, a venue's show counters) marks the area dirty in the same
+transaction, and that is all a write pays. Dirty areas are rebuilt from
+the venues table:
+
+  * by the venues page, which checks for dirty areas at most once per
+    VENUE_AREAS_MAX_STALENESS seconds per worker, so none stays dirty
+    for longer than that while the page is read,
+  * by the commands that change many venues at once (imports, counter
+    rollovers) when they finish,
+  * by `flask areas refresh`, `--all` rebuilds the whole table.
+
+A refresh locks the area rows before reading the venues (on Postgres), so
+it waits for open transactions that marked them and sees their changes.
+'''
+
+CHUNK_SIZE = 500
+
+
+def chunks(items, size=CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_missing(connection, table):
+    '''
+    INSERT that skips rows whose primary key is taken, so two writers
+    adding the same new area do not fail each other.
+    '''
+    if connection.dialect.name == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return sqlite.insert(table).on_conflict_do_nothing()
+
+
+def mark_areas(connection, areas, now=None):
+    '''
+    Marks the (state, city) areas dirty and adds the ones that are not
+    summarized yet. Venues without a city or state are not listed.
+    '''
+    areas = sorted({(state, city) for state, city in areas if state and city})
+    if not areas:
+        return
+    now = now or datetime.now()
+    table = VenueArea.__table__
+    for chunk in chunks(areas):
+        connection.execute(table.update().where(tuple_(table.c.state, table.c.city).in_(chunk)).values(
+            dirty_since=func.coalesce(table.c.dirty_since, now)
+        ))
+        connection.execute(insert_missing(connection, table), [
+            {'state': state, 'city': city, 'venues': [], 'dirty_since': now}
+            for state, city in chunk
+        ])
+
+
+def mark_venue_areas(connection, where=None, now=None):
+    '''
+    Marks the areas of the venues matching `where` (all when None).
+    '''
+    query = select(Venue.state, Venue.city).distinct()
+    if where is not None:
+        query = query.where(where)
+    mark_areas(connection, [tuple(row) for row in connection.execute(query)], now)
+
+
+def summarize(rows):
+    '''
+    {(state, city): venue list} from venue rows ordered by area and id.
+    '''
+    return {
+        area: [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.upcoming_shows_count
+        } for row in venues]
+        for area, venues in groupby(rows, key=lambda row: (row.state, row.city))
+    }
+
+
+def venue_rows(connection, where=None):
+    query = select(
+        Venue.state, Venue.city, Venue.id, Venue.name, Venue.upcoming_shows_count
+    ).where(Venue.state.isnot(None), Venue.city.isnot(None)).order_by(Venue.state, Venue.city, Venue.id)
+    if where is not None:
+        query = query.where(where)
+    return connection.execute(query)
+
+
+def area_values(venues, now):
+    return {
+        'venue_count': len(venues),
+        'upcoming_shows_count': sum(venue['num_upcoming_shows'] for venue in venues),
+        'venues': venues,
+        'dirty_since': None,
+        'refreshed_at': now,
+    }
+
+
+def refresh_areas(connection, now=None):
+    '''
+    Rebuilds every dirty area from the venues table. Returns how many
+    areas were refreshed.
+    '''
+    now = now or datetime.now()
+    table = VenueArea.__table__
+    dirty = [tuple(row) for row in connection.execute(
+        select(table.c.state, table.c.city).where(table.c.dirty_since.isnot(None))
+    )]
+    for chunk in chunks(sorted(dirty)):
+        in_chunk = tuple_(table.c.state, table.c.city).in_(chunk)
+        connection.execute(select(table.c.state).where(in_chunk).with_for_update()).all()
+        summaries = summarize(venue_rows(connection, tuple_(Venue.state, Venue.city).in_(chunk)))
+        for state, city in chunk:
+            venues = summaries.get((state, city))
+            where = (table.c.state == state) & (table.c.city == city)
+            if venues is None:
+                connection.execute(table.delete().where(where))
+            else:
+                connection.execute(table.update().where(where).values(**area_values(venues, now)))
+    return len(dirty)
+
+
+def rebuild_areas(connection, now=None):
+    '''
+    Replaces the whole table with a fresh summary of every venue.
+    '''
+    now = now or datetime.now()
+    table = VenueArea.__table__
+    connection.execute(table.delete())
+    summaries = summarize(venue_rows(connection))
+    for chunk in chunks(summaries.items()):
+        connection.execute(table.insert(), [
+            dict(area_values(venues, now), state=state, city=city)
+            for (state, city), venues in chunk
+        ])
+    return len(summaries)
+
+
+# a venue of the listing, like the rows of the genre filtered query
+VenueRow = namedtuple('VenueRow', ['city', 'state', 'id', 'name', 'num_upcoming_shows'])
+
+VENUE_KEY = (Venue.state, Venue.city, Venue.id)
+
+
+def summary_venues(session, cursor=None, backwards=False, batch_size=CHUNK_SIZE):
+    '''
+    VenueRows of the summary in (state, city, id) order, or the reverse,
+    strictly past the `cursor` key. Areas are read `batch_size` at a time,
+    only as far as the caller iterates.
+    '''
+    area_key = tuple_(VenueArea.state, VenueArea.city)
+    order = (VenueArea.state, VenueArea.city)
+    if backwards:
+        order = tuple(column.desc() for column in order)
+    # the cursor's own area is read again, from the venue after the cursor
+    bound, inclusive = (tuple(cursor[:2]), True) if cursor else (None, False)
+
+    while True:
+        query = session.query(VenueArea.state, VenueArea.city, VenueArea.venues)
+        if bound is not None:
+            if backwards:
+                query = query.filter(area_key <= bound if inclusive else area_key < bound)
+            else:
+                query = query.filter(area_key >= bound if inclusive else area_key > bound)
+        areas = query.order_by(*order).limit(batch_size).all()
+
+        for area in areas:
+            venues = reversed(area.venues) if backwards else area.venues
+            for venue in venues:
+                if cursor and (area.state, area.city) == tuple(cursor[:2]) and \
+                        (venue['id'] >= cursor[2] if backwards else venue['id'] <= cursor[2]):
+                    continue
+                yield VenueRow(area.city, area.state, venue['id'], venue['name'], venue['num_upcoming_shows'])
+
+        if len(areas) < batch_size:
+            return
+        bound, inclusive = (areas[-1].state, areas[-1].city), False
+
+
+def summary_page(session, limit):
+    '''
+    One Page of VenueRows from the summary for the request's `after` /
+    `before` cursor. Every area holds at least one venue once refreshed,
+    so a page is usually a single read of `limit` + 1 areas.
+    '''
+    before = decode_cursor(request.args.get('before'), VENUE_KEY)
+    after = decode_cursor(request.args.get('after'), VENUE_KEY)
+    backwards = before is not None
+    rows = list(islice(
+        summary_venues(session, before if backwards else after, backwards, limit + 1), limit + 1
+    ))
+    return make_page(rows, limit, backwards, backwards or after is not None,
+                     lambda row: (row.state, row.city, row.id))
+
+
+class AreaSummary:
+
+    def __init__(self):
+        self.engine = None
+        self.max_staleness = 60
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        '''
+        `engine` is the primary, refreshes write to it whichever database
+        the request reads from.
+        '''
+        self.engine = engine
+        self.max_staleness = app.config['VENUE_AREAS_MAX_STALENESS']
+
+    def ensure_fresh(self):
+        '''
+        Refreshes the dirty areas, checking at most once per staleness
+        bound per worker. An area marked dirty right after a check is
+        refreshed by the next one, so it lags by at most the bound.
+        '''
+        with self.lock:
+            if time.monotonic() - self.checked_at < self.max_staleness:
+                return
+            self.checked_at = time.monotonic()
+        with self.engine.begin() as connection:
+            dirty = connection.execute(select(func.min(VenueArea.dirty_since))).scalar()
+            if dirty is not None:
+                refresh_areas(connection)
+
+
+@event.listens_for(Venue, 'after_insert')
+@event.listens_for(Venue, 'after_delete')
+def venue_added_or_removed(mapper, connection, venue):
+    mark_areas(connection, [(venue.state, venue.city)])
+
+
+@event.listens_for(Venue, 'after_update')
+def venue_updated(mapper, connection, venue):
+    state = db.inspect(venue)
+    history = {name: state.attrs[name].history for name in ('state', 'city', 'name')}
+    if not any(item.has_changes() for item in history.values()):
+        return
+    old = tuple(
+        history[name].deleted[0] if history[name].deleted else getattr(venue, name)
+        for name in ('state', 'city')
+    )
+    mark_areas(connection, [old, (venue.state, venue.city)])
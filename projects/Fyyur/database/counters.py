@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from sqlalchemy import case, event, func, or_, select
+
+from .models import Artist, Venue, Show, db
+from . import areas
+
+#---#COUNTERS#---#
+
+'''
+Venue and Artist carry upcoming_shows_count, past_shows_count and
+next_show_time so listings can show counts without touching shows.
+
+Inserting a show bumps the counters in the same flush; deleting or moving
+one recomputes the counters of the entities involved. Time passing moves
+shows from upcoming to past, which roll_over() catches up on: every entity
+whose next_show_time has passed gets its counters recomputed.
+'''
+
+# For each entity: the Show column pointing at it.
+SHOW_OWNERS = {
+    Venue: Show.venue_id,
+    Artist: Show.artist_id,
+}
+
+
+def as_datetime(value):
+    # Form handlers hand the raw start_time string to Show.
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def count_show(connection, show, now=None):
+    now = now or datetime.now()
+    start_time = as_datetime(show.start_time)
+    for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        if start_time > now:
+            values = {
+                'upcoming_shows_count': model.upcoming_shows_count + 1,
+                'version': model.version + 1,
+                'next_show_time': case(
+                    (or_(model.next_show_time.is_(None), model.next_show_time > start_time), start_time),
+                    else_=model.next_show_time
+                ),
+            }
+        else:
+            values = {'past_shows_count': model.past_shows_count + 1, 'version': model.version + 1}
+        connection.execute(
+            model.__table__.update().where(model.id == int(entity_id)).values(**values)
+        )
+        if model is Venue:
+            areas.mark_venue_areas(connection, Venue.id == int(entity_id), now)
+
+
+def refresh_counters(connection, model, where=None, now=None):
+    '''
+    Recomputes the counters of every `model` row matching `where` (all rows
+    when None) from the shows table in a single UPDATE.
+    '''
+    now = now or datetime.now()
+    owner = SHOW_OWNERS[model]
+
+    def shows_of(column, *criteria):
+        return select(column).where(owner == model.id, *criteria).scalar_subquery()
+
+    statement = model.__table__.update().values(
+        upcoming_shows_count=shows_of(func.count(Show.id), Show.start_time > now),
+        past_shows_count=shows_of(func.count(Show.id), Show.start_time <= now),
+        next_show_time=shows_of(func.min(Show.start_time), Show.start_time > now),
+        # the entity's page changes with its shows
+        version=model.version + 1,
+    )
+    if where is not None:
+        statement = statement.where(where)
+    if model is Venue:
+        # before the UPDATE, which can change what `where` matches
+        areas.mark_venue_areas(connection, where, now)
+    return connection.execute(statement).rowcount
+
+
+def roll_over(connection, now=None):
+    '''
+    Moves shows that started since the last run from upcoming to past.
+    Only entities whose next show has started are touched.
+    '''
+    now = now or datetime.now()
+    return sum(
+        refresh_counters(connection, model, model.next_show_time <= now, now)
+        for model in SHOW_OWNERS
+    )
+
+
+def reconcile(connection, now=None):
+    '''
+    Recomputes every counter from scratch.
+    '''
+    return sum(refresh_counters(connection, model, None, now) for model in SHOW_OWNERS)
+
+
+@event.listens_for(Show, 'after_insert')
+def show_inserted(mapper, connection, show):
+    count_show(connection, show)
+
+
+@event.listens_for(Show, 'after_delete')
+def show_deleted(mapper, connection, show):
+    refresh_counters(connection, Venue, Venue.id == show.venue_id)
+    refresh_counters(connection, Artist, Artist.id == show.artist_id)
+
+
+@event.listens_for(Show, 'after_update')
+def show_updated(mapper, connection, show):
+    # A show can move in time or change hands: refresh old and new owners.
+    state = db.inspect(show)
+    for model, attribute in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        ids = [entity_id for entity_id in state.attrs[attribute].history.sum() if entity_id is not None]
+        refresh_counters(connection, model, model.id.in_(ids))
@@ -7,9 +7,19 @@ from flask import Flask, render_template, request, flash, redirect, url_for, abo
 from flask_migrate import Migrate
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
-from ..forms import *
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import object_session
+from datetime import datetime
 
-db = SQLAlchemy()
+from .routing import RoutingSession
+
+# Reads of read-only requests can go to replicas, see routing.py
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Genres are a text[] on Postgres (GIN indexed, see the bottom of this file)
+# and a JSON list on SQLite. Either way the attribute is a Python list.
+GENRES_TYPE = postgresql.ARRAY(db.String(120)).with_variant(db.JSON(), 'sqlite')
 
 #---#MODELS#---#
 
@@ -22,7 +32,7 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(GENRES_TYPE)
     facebook_link = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     website = db.Column(db.String(120))
@@ -30,6 +40,18 @@ class Venue(db.Model):
     seeking_description = db.Column(db.String(120))
     shows = db.relationship('Show', backref='venue', lazy=True)
 
+    # Denormalized show counters, kept up to date by database/counters.py
+    upcoming_shows_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    past_shows_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    next_show_time = db.Column(db.DateTime, index=True)
+    # Bumped whenever anything on the entity's page changes: its row, its
+    # shows or the partners they show. The API derives ETags from it.
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_venues_state_city', 'state', 'city', 'id'),
+    )
+
     def __repr__(self):
         return f'<Venue {self.id} {self.name}>'
 
@@ -42,7 +64,7 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(GENRES_TYPE)
     facebook_link = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     website = db.Column(db.String(120))
@@ -50,6 +72,18 @@ class Artist(db.Model):
     seeking_description = db.Column(db.String(120))
     shows = db.relationship('Show', backref='artist', lazy=True)
 
+    # Denormalized show counters, kept up to date by database/counters.py
+    upcoming_shows_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    past_shows_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    next_show_time = db.Column(db.DateTime, index=True)
+    # Bumped whenever anything on the entity's page changes: its row, its
+    # shows or the partners they show. The API derives ETags from it.
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_artists_name', 'name'),
+    )
+
     def __repr__(self):
         return f'<Artist {self.id} {self.name}>'
 
@@ -62,5 +96,51 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
     start_time = db.Column(db.DateTime, default=datetime.now(), nullable=False)
 
+    # Detail pages filter shows of one venue or artist by start_time. The
+    # calendar seeks a start_time window in (start_time, id) order, and
+    # with a city filter goes through the venue index instead.
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    )
+
     def __repr__(self):
         return f'<Show {self.id} {self.artist_id} {self.venue_id} {self.start_time}>'
+
+
+class VenueArea(db.Model):
+    '''
+    Summary row of one city for the venues page, maintained by
+    database/areas.py: the area's venues with their upcoming show counts.
+    '''
+    __tablename__ = 'venue_areas'
+
+    state = db.Column(db.String(120), primary_key=True)
+    city = db.Column(db.String(120), primary_key=True)
+    venue_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    upcoming_shows_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # [{"id", "name", "num_upcoming_shows"}, ...] ordered by id
+    venues = db.Column(db.JSON, nullable=False, default=list)
+    # First change since the last refresh, None when up to date
+    dirty_since = db.Column(db.DateTime, index=True)
+    refreshed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<VenueArea {self.city}, {self.state} {self.venue_count} venues>'
+
+
+for model in (Venue, Artist):
+    event.listen(model.__table__, 'after_create', DDL(
+        f'CREATE INDEX ix_{model.__tablename__}_genres ON {model.__tablename__} USING GIN (genres)'
+    ).execute_if(dialect='postgresql'))
+
+
+def bump_version(mapper, connection, target):
+    # Only for column changes; the counters bump it in their own UPDATEs.
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = type(target).version + 1
+
+
+for model in (Venue, Artist):
+    event.listen(model, 'before_update', bump_version)
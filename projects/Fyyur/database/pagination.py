@@ -0,0 +1,167 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import datetime
+
+from flask import request, url_for
+from sqlalchemy import DateTime, tuple_
+
+#---#PAGINATION#---#
+
+'''
+Page
+    one page of a keyset paginated listing. The cursors are opaque strings
+    for the `after` / `before` query arguments, or None at either end.
+'''
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(values):
+    data = json.dumps([
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ])
+    return urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    '''
+    Turns a cursor back into the key values of `columns`. Returns None for a
+    missing or malformed cursor, which callers treat as the first page.
+    '''
+    if not cursor:
+        return None
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            return None
+        return tuple(
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(columns, values)
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def page_limit(config):
+    limit = request.args.get('limit', config['LISTING_PAGE_SIZE'], type=int)
+    return max(1, min(limit, config['LISTING_MAX_PAGE_SIZE']))
+
+
+def seek(query, columns, limit):
+    '''
+    Applies the `after` / `before` cursors of the request to `query`.
+
+    Seeks with a row value comparison on the key instead of an OFFSET, so
+    every page costs the same index range scan however deep it is. One row
+    past `limit` is fetched to tell whether another page follows. Returns
+    the query, whether it runs backwards (a `before` page, newest first)
+    and whether a cursor was given at all.
+    '''
+    key_expr = tuple_(*columns)
+    before = decode_cursor(request.args.get('before'), columns)
+    after = decode_cursor(request.args.get('after'), columns)
+
+    if before is not None:
+        query = query.filter(key_expr < tuple_(*before)).order_by(
+            *[column.desc() for column in columns]
+        )
+        return query.limit(limit + 1), True, True
+
+    if after is not None:
+        query = query.filter(key_expr > tuple_(*after))
+    return query.order_by(*columns).limit(limit + 1), False, after is not None
+
+
+def key_of(columns):
+    return lambda row: tuple(getattr(row, column.key) for column in columns)
+
+
+def keyset_page(query, columns, limit, key=None):
+    '''
+    Returns one Page of `query` ordered by the unique key `columns`.
+    `key` maps a result row to its key values and defaults to reading the
+    key columns off it.
+    '''
+    key = key or key_of(columns)
+    query, backwards, has_cursor = seek(query, columns, limit)
+    return make_page(query.all(), limit, backwards, has_cursor, key)
+
+
+def make_page(rows, limit, backwards, has_cursor, key):
+    '''
+    Builds the Page of `rows`, read in key order (or the reverse for a
+    `before` page) with one row past `limit` when another page follows.
+    '''
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, has_cursor
+
+    return Page(
+        items=rows,
+        next_cursor=encode_cursor(key(rows[-1])) if rows and has_next else None,
+        prev_cursor=encode_cursor(key(rows[0])) if rows and has_prev else None
+    )
+
+
+class StreamedPage:
+    '''
+    A Page whose rows are fetched in batches of `batch_size` while the
+    template iterates over it, for stream_template(). The cursors are only
+    known once the rows have been consumed, so templates read them after
+    the loop. `before` pages come back newest first and have to be
+    reversed, those are held in memory (at most one page).
+    '''
+
+    def __init__(self, query, columns, limit, batch_size=100, key=None):
+        self.key = key or key_of(columns)
+        self.limit = limit
+        query, self.backwards, self.has_cursor = seek(query, columns, limit)
+        self.query = query.yield_per(batch_size)
+        self.first = None
+        self.last = None
+        self.has_more = False
+
+    def __iter__(self):
+        if self.backwards:
+            rows = self.query.all()
+            self.has_more = len(rows) > self.limit
+            rows = reversed(rows[:self.limit])
+        else:
+            rows = self.query
+        for count, row in enumerate(rows, 1):
+            if count > self.limit:
+                # the extra row only says that another page exists
+                self.has_more = True
+                break
+            if self.first is None:
+                self.first = row
+            self.last = row
+            yield row
+
+    @property
+    def next_cursor(self):
+        has_next = True if self.backwards else self.has_more
+        return encode_cursor(self.key(self.last)) if self.last is not None and has_next else None
+
+    @property
+    def prev_cursor(self):
+        has_prev = self.has_more if self.backwards else self.has_cursor
+        return encode_cursor(self.key(self.first)) if self.first is not None and has_prev else None
+
+
+def page_url(**cursor):
+    '''
+    URL of the current listing with the cursor swapped, keeping every other
+    query argument (page size, filters).
+    '''
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update(cursor)
+    return url_for(request.endpoint, **args)
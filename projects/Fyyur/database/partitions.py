@@ -0,0 +1,126 @@
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from .models import Artist, Venue
+from .counters import refresh_counters
+
+#---#SHOW PARTITIONS#---#
+
+'''
+Opt-in monthly range partitioning of shows on start_time, Postgres only.
+
+The conversion runs from the migration under migrations/versions
+(`flask db upgrade -x partition_shows=true`), which ships the same
+statements as below. Each month is a partition named shows_YYYY_MM, and
+a shows_default partition takes whatever falls outside them, so inserts
+never fail. Creating a month later moves its rows out of the default
+partition first.
+
+Queries that bound start_time (upcoming shows, the calendar, the counter
+refreshes) are pruned to the partitions of the months they cover.
+Archiving detaches whole past months: they leave the shows table but stay
+in the database as plain tables.
+'''
+
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION fyyur_create_show_partition(month date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+    first_day date := date_trunc('month', month)::date;
+    next_first_day date := (date_trunc('month', month) + interval '1 month')::date;
+    name text := 'shows_' || to_char(first_day, 'YYYY_MM');
+BEGIN
+    IF to_regclass(name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE shows INCLUDING DEFAULTS)', name);
+    -- shows of that month that went to the default partition move over
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM shows_default WHERE start_time >= %L AND start_time < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved', first_day, next_first_day, name);
+    -- lets ATTACH skip scanning the new table
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (start_time >= %L AND start_time < %L)',
+                   name, name || '_range', first_day, next_first_day);
+    EXECUTE format('ALTER TABLE shows ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   name, first_day, next_first_day);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', name, name || '_range');
+    RETURN true;
+END $$
+"""
+
+BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def month_of(value):
+    return date(value.year, value.month, 1)
+
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('shows'))"
+    )).scalar()
+
+
+def partitions(connection):
+    '''
+    The attached partitions as (name, first day, first day of the next
+    month) ordered by month. The default partition is left out.
+    '''
+    rows = connection.execute(text(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+        "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'shows'::regclass"
+    ))
+    found = []
+    for name, bound in rows:
+        match = BOUND.search(bound)
+        if match:
+            found.append((name, datetime.fromisoformat(match[1]).date(), datetime.fromisoformat(match[2]).date()))
+    return sorted(found, key=lambda partition: partition[1])
+
+
+def create_partitions(connection, months_ahead=12, now=None):
+    '''
+    Makes sure every month from the current one to `months_ahead` months
+    ahead has its partition. Returns the names of the partitions created.
+    '''
+    current = month_of(now or datetime.now())
+    connection.execute(text(CREATE_PARTITION_FUNCTION))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if connection.execute(text('SELECT fyyur_create_show_partition(:month)'), {'month': month}).scalar():
+            created.append(f'shows_{month:%Y_%m}')
+    return created
+
+
+def archive_partitions(connection, before):
+    '''
+    Detaches every monthly partition that ends on or before `before`, and
+    recomputes the counters of the venues and artists whose shows left.
+    Returns (detached table names, venue ids, artist ids).
+    '''
+    detached = []
+    venue_ids, artist_ids = set(), set()
+    for name, first_day, next_first_day in partitions(connection):
+        if next_first_day > before:
+            continue
+        for ids, column in ((venue_ids, 'venue_id'), (artist_ids, 'artist_id')):
+            ids.update(row[0] for row in connection.execute(text(f'SELECT DISTINCT {column} FROM "{name}"')))
+        connection.execute(text(f'ALTER TABLE shows DETACH PARTITION "{name}"'))
+        detached.append(name)
+
+    if venue_ids:
+        refresh_counters(connection, Venue, Venue.id.in_(venue_ids))
+    if artist_ids:
+        refresh_counters(connection, Artist, Artist.id.in_(artist_ids))
+    return detached, venue_ids, artist_ids
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+#---#POOL TELEMETRY#---#
+
+logger = logging.getLogger('fyyur.pool')
+
+
+class PoolStats:
+    '''
+    Counters for one connection pool. `connects` growing alongside
+    `checkouts` means connections are churned instead of reused.
+    '''
+
+    def __init__(self, slow_wait_ms=None):
+        self.lock = threading.Lock()
+        self.slow_wait_ms = slow_wait_ms
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def record_wait(self, waited_ms):
+        with self.lock:
+            self.waits += 1
+            self.wait_total_ms += waited_ms
+            self.wait_max_ms = max(self.wait_max_ms, waited_ms)
+        if self.slow_wait_ms is not None and waited_ms >= self.slow_wait_ms:
+            logger.warning('waited %.1f ms for a database connection', waited_ms)
+
+    def as_dict(self):
+        return {
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'checkins': self.checkins,
+            'invalidations': self.invalidations,
+            'timeouts': self.timeouts,
+            'wait_avg_ms': self.wait_total_ms / self.waits if self.waits else 0.0,
+            'wait_max_ms': self.wait_max_ms,
+        }
+
+
+class TimedQueuePool(QueuePool):
+    '''
+    QueuePool that times how long every checkout waits for a connection,
+    including the time spent opening a new one.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = PoolStats(self.stats.slow_wait_ms)
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            logger.error('connection pool exhausted: %s', self.status())
+            raise
+        finally:
+            self.stats.record_wait((time.perf_counter() - start) * 1000)
+
+
+def stats_of(pool):
+    # engine.dispose() swaps in a new pool, which starts its own counters
+    if not hasattr(pool, 'stats'):
+        pool.stats = PoolStats()
+    return pool.stats
+
+
+def init_pool_telemetry(engine, slow_wait_ms=None):
+    '''
+    Counts connects, checkouts, checkins and invalidations of the engine's
+    pool. Checkout waits are only timed with TimedQueuePool; waits of at
+    least `slow_wait_ms` are logged.
+    '''
+    stats_of(engine.pool).slow_wait_ms = slow_wait_ms
+
+    @event.listens_for(engine, 'connect')
+    def connected(dbapi_connection, record):
+        stats_of(engine.pool).connects += 1
+
+    @event.listens_for(engine, 'checkout')
+    def checked_out(dbapi_connection, record, proxy):
+        stats_of(engine.pool).checkouts += 1
+
+    @event.listens_for(engine, 'checkin')
+    def checked_in(dbapi_connection, record):
+        stats_of(engine.pool).checkins += 1
+
+    @event.listens_for(engine, 'invalidate')
+    def invalidated(dbapi_connection, record, exception):
+        stats_of(engine.pool).invalidations += 1
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+        })
+    status.update(stats_of(pool).as_dict())
+    return status
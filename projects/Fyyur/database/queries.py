@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from sqlalchemy import case, exists, func, select, union_all, update
+
+from .models import Artist, Venue, Show, db
+
+#---#QUERIES#---#
+
+# For each entity: the Show column pointing at it, the entity on the other
+# side of the show and the Show column pointing at that one.
+SHOW_PARTNERS = {
+    Venue: (Show.venue_id, Artist, Show.artist_id),
+    Artist: (Show.artist_id, Venue, Show.venue_id),
+}
+
+
+def entity_with_shows(model, entity_id, now=None):
+    '''
+    Loads a Venue or Artist together with all of its shows in one statement.
+
+    Every show is joined to the entity on the other side (the artist of a
+    venue's show, the venue of an artist's show) and split into past and
+    upcoming against a single captured `now`. Both counts are computed in
+    SQL with window sums, so they arrive on every row.
+
+    Returns (entity, past_shows, upcoming_shows, past_count, upcoming_count)
+    where the show lists hold (id, name, image_link, start_time) rows of the
+    partner entity, or None when the entity does not exist.
+    '''
+    now = now or datetime.now()
+    own_fk, partner, partner_fk = SHOW_PARTNERS[model]
+
+    # Upcoming and past shows are read by separate branches, each bounded
+    # on start_time, so with shows partitioned by month the upcoming one
+    # only visits the current and future partitions.
+    def branch(bound):
+        return select(
+            own_fk.label('owner_id'), partner_fk.label('partner_id'), Show.start_time
+        ).where(own_fk == entity_id, bound)
+
+    shows = union_all(branch(Show.start_time > now), branch(Show.start_time < now)).subquery('entity_shows')
+
+    is_upcoming = case((shows.c.start_time > now, 1), else_=0)
+    is_past = case((shows.c.start_time < now, 1), else_=0)
+
+    rows = db.session.query(
+        model,
+        partner.id,
+        partner.name,
+        partner.image_link,
+        shows.c.start_time,
+        func.coalesce(func.sum(is_past).over(), 0).label('past_count'),
+        func.coalesce(func.sum(is_upcoming).over(), 0).label('upcoming_count')
+        ).outerjoin(
+            shows, shows.c.owner_id == model.id
+        ).outerjoin(
+            partner, partner.id == shows.c.partner_id
+        ).filter(
+            model.id == entity_id
+        ).order_by(
+            shows.c.start_time
+        ).all()
+
+    if not rows:
+        return None
+
+    past_shows = []
+    upcoming_shows = []
+    for row in rows:
+        if row.start_time is None:
+            continue
+        show = (row[1], row[2], row[3], row.start_time)
+        if row.start_time < now:
+            past_shows.append(show)
+        elif row.start_time > now:
+            upcoming_shows.append(show)
+
+    first = rows[0]
+    return first[0], past_shows, upcoming_shows, first.past_count, first.upcoming_count
+
+
+def show_partner_ids(model, entity_id):
+    '''
+    Ids of every entity on the other side of `model`'s shows: the artists
+    that played a venue, or the venues an artist played.
+    '''
+    own_fk, partner, partner_fk = SHOW_PARTNERS[model]
+    return [row[0] for row in db.session.query(partner_fk).filter(own_fk == entity_id).distinct()]
+
+
+def touch_partners(model, entity_id):
+    '''
+    Bumps the version of every partner of `model`'s shows, whose pages
+    show its name and image, in the session's transaction. Returns their
+    ids.
+    '''
+    own_fk, partner, partner_fk = SHOW_PARTNERS[model]
+    ids = show_partner_ids(model, entity_id)
+    if ids:
+        db.session.execute(
+            update(partner).where(partner.id.in_(ids)).values(version=partner.version + 1)
+        )
+    return ids
+
+
+def has_genre(model, genre):
+    '''
+    Filter for Venue or Artist rows tagged with `genre`. On Postgres this is
+    an array containment the GIN index on genres answers; SQLite looks
+    through the JSON list.
+    '''
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return model.genres.contains([genre])
+    genres = func.json_each(model.genres).table_valued('value')
+    return exists(select(1).select_from(genres).where(genres.c.value == genre))
@@ -0,0 +1,192 @@
+import itertools
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+
+#---#READ REPLICAS#---#
+
+'''
+Sends the reads of read-only requests to replica binds.
+
+Every request is routed to 'primary' or 'replica' before the view runs:
+GET and HEAD requests read from a replica, everything else uses the
+primary, and views marked with @primary or @replica override that. Within
+a replica routed request, pending changes and flushes still go to the
+primary, and so does every read after the first write.
+
+A client that wrote something reads from the primary for the next
+DB_READ_AFTER_WRITE_SECONDS (a timestamp in its session), so it sees its
+own change before the replicas catch up. A replica that fails to connect
+or drops its connection is skipped for DB_REPLICA_RETRY_SECONDS, doubled
+for every failure in a row up to MAX_BACKOFF times that, until it hands
+out a new connection again; with no healthy replica left the reads go to
+the primary. The request that ran into the failure gets the error.
+'''
+
+logger = logging.getLogger('fyyur.replicas')
+
+PRIMARY_UNTIL = 'db_primary_until'
+
+# longest wait before retrying a replica, in DB_REPLICA_RETRY_SECONDS
+MAX_BACKOFF = 8
+
+
+def primary(view):
+    '''
+    Always use the primary for this view, e.g. forms that must show the
+    latest data.
+    '''
+    view.db_route = 'primary'
+    return view
+
+
+def replica(view):
+    '''
+    Read from a replica even though the method is not GET (search forms).
+    '''
+    view.db_route = 'replica'
+    return view
+
+
+def read_from_primary():
+    '''
+    Sends the rest of the request's reads to the primary. For views that
+    store what they read in a shared cache: a lagging replica would put
+    data from before the latest write there, for every client, until the
+    entry expires.
+    '''
+    if has_request_context():
+        g.db_route = 'primary'
+        g.pop('db_replica', None)
+
+
+class ReplicaRouter:
+
+    def __init__(self):
+        self.keys = []
+        self.down_until = {}
+        self.failures = {}
+        self.failures_in_row = {}
+        self.retry_seconds = 30
+        self.read_after_write_seconds = 5
+        self.lock = threading.Lock()
+        self.turn = itertools.count()
+
+    def init_app(self, app, engines):
+        '''
+        `engines` are the engines of the Flask-SQLAlchemy binds, the
+        replica binds are the ones named replica_*.
+        '''
+        self.keys = sorted(key for key in engines if key and key.startswith('replica'))
+        self.retry_seconds = app.config['DB_REPLICA_RETRY_SECONDS']
+        self.read_after_write_seconds = app.config['DB_READ_AFTER_WRITE_SECONDS']
+        for key in self.keys:
+            event.listen(engines[key], 'handle_error', self.error_handler(key))
+            event.listen(engines[key].pool, 'connect', self.connect_handler(key))
+        app.before_request(self.route_request)
+        app.after_request(self.remember_write)
+
+    def error_handler(self, key):
+        def handle_error(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, exc.OperationalError):
+                self.mark_down(key, context.original_exception)
+        return handle_error
+
+    def connect_handler(self, key):
+        def connect(dbapi_connection, connection_record):
+            self.failures_in_row.pop(key, None)
+        return connect
+
+    def mark_down(self, key, error=None):
+        with self.lock:
+            in_row = self.failures_in_row.get(key, 0) + 1
+            self.failures_in_row[key] = in_row
+            self.failures[key] = self.failures.get(key, 0) + 1
+            seconds = self.retry_seconds * min(2 ** (in_row - 1), MAX_BACKOFF)
+            self.down_until[key] = time.monotonic() + seconds
+        logger.warning('replica %s unavailable for %ds: %s', key, seconds, error)
+
+    def healthy(self):
+        now = time.monotonic()
+        return [key for key in self.keys if self.down_until.get(key, 0) <= now]
+
+    def choose(self, engines):
+        '''
+        Round robin over the healthy replicas, None when there are none.
+        '''
+        healthy = self.healthy()
+        if not healthy:
+            return None
+        return engines[healthy[next(self.turn) % len(healthy)]]
+
+    def route_request(self):
+        view = current_app.view_functions.get(request.endpoint)
+        route = getattr(view, 'db_route', None)
+        if route is None:
+            route = 'replica' if request.method in ('GET', 'HEAD') else 'primary'
+        if route == 'replica' and session.get(PRIMARY_UNTIL, 0) > time.time():
+            route = 'primary'
+        g.db_route = route
+
+    def remember_write(self, response):
+        # Writes go through non-GET routes; the flush check also catches
+        # a GET view that writes.
+        wrote = g.get('db_wrote') or (
+            g.get('db_route') == 'primary' and request.method not in ('GET', 'HEAD')
+        )
+        if wrote and self.keys and self.read_after_write_seconds > 0 and response.status_code < 400:
+            session[PRIMARY_UNTIL] = time.time() + self.read_after_write_seconds
+        return response
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            key: {
+                'healthy': self.down_until.get(key, 0) <= now,
+                'retry_in_seconds': max(0.0, round(self.down_until.get(key, 0) - now, 1)),
+                'failures': self.failures.get(key, 0),
+            }
+            for key in self.keys
+        }
+
+
+replicas = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    '''
+    Flask-SQLAlchemy session that reads from a replica when the request
+    was routed to one. Models with their own bind key and explicit binds
+    are left alone.
+    '''
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not replicas.keys or not self.reads_from_replica():
+            return engine
+        engines = self._db.engines
+        if engine is not engines.get(None):
+            return engine
+        # One replica per request, so its reads see one consistent snapshot
+        if 'db_replica' not in g:
+            g.db_replica = replicas.choose(engines) or engine
+        return g.db_replica
+
+    def reads_from_replica(self):
+        return (
+            has_request_context()
+            and g.get('db_route') == 'replica'
+            and not g.get('db_wrote')
+            and not self._flushing
+            and not (self.new or self.dirty or self.deleted)
+        )
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def flushed(db_session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
@@ -0,0 +1,127 @@
+import re
+
+from sqlalchemy import DDL, String, cast, column, event, func, literal_column, or_, table
+
+from .models import Artist, Venue, db
+
+#---#SEARCH#---#
+
+'''
+Postgres keeps a generated, weighted tsvector column per table with a GIN
+index on it, plus a trigram GIN index on name for fuzzy matching.
+The same statements ship in the migrations under migrations/versions.
+'''
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # array_to_string() is only STABLE, generated columns need IMMUTABLE.
+    "CREATE OR REPLACE FUNCTION fyyur_genres_text(varchar[]) RETURNS text "
+    "LANGUAGE sql IMMUTABLE AS $$ SELECT array_to_string($1, ' ') $$",
+    "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(city, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(fyyur_genres_text(genres), '')), 'C')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_{table}_search_vector "
+    "ON {table} USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm "
+    "ON {table} USING GIN (name gin_trgm_ops)",
+]
+
+'''
+SQLite (local runs and tests) falls back to an external content FTS5 table
+kept in sync with triggers. Genres are stored as JSON there, which the FTS5
+tokenizer splits into words by itself.
+'''
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+    "name, city, genres, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {table}_fts(rowid, name, city, genres) "
+    "VALUES (new.id, new.name, new.city, new.genres); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, name, city, genres) "
+    "VALUES ('delete', old.id, old.name, old.city, old.genres); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, name, city, genres) "
+    "VALUES ('delete', old.id, old.name, old.city, old.genres); "
+    "INSERT INTO {table}_fts(rowid, name, city, genres) "
+    "VALUES (new.id, new.name, new.city, new.genres); END",
+]
+
+for model in (Venue, Artist):
+    name = model.__tablename__
+    for statement in POSTGRES_DDL:
+        event.listen(model.__table__, 'after_create',
+                     DDL(statement.format(table=name)).execute_if(dialect='postgresql'))
+    for statement in SQLITE_DDL:
+        event.listen(model.__table__, 'after_create',
+                     DDL(statement.format(table=name)).execute_if(dialect='sqlite'))
+    event.listen(model.__table__, 'before_drop',
+                 DDL(f'DROP TABLE IF EXISTS {name}_fts').execute_if(dialect='sqlite'))
+
+
+def search_terms(search_term):
+    return re.findall(r'\w+', search_term or '')
+
+
+def search(model, search_term, limit, offset=0):
+    '''
+    Ranked prefix/fuzzy search over name, city and genres of a Venue or
+    Artist. Returns (count, rows) where rows is one page of model instances,
+    best match first. The total count comes from a window function, so a
+    page is a single statement.
+    '''
+    terms = search_terms(search_term)
+    total = func.count().over().label('total')
+    query = db.session.query(model, total)
+
+    if terms:
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            query = _postgres_search(query, model, terms, search_term)
+        elif dialect == 'sqlite':
+            query = _sqlite_search(query, model, terms)
+        else:
+            query = _prefix_search(query, model, terms)
+    else:
+        query = query.order_by(model.name, model.id)
+
+    rows = query.limit(limit).offset(offset).all()
+    count = rows[0].total if rows else 0
+    return count, [row[0] for row in rows]
+
+
+def _postgres_search(query, model, terms, search_term):
+    vector = literal_column(f'{model.__tablename__}.search_vector')
+    ts_query = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+    rank = func.ts_rank(vector, ts_query) + func.similarity(model.name, search_term)
+    return query.filter(
+        or_(vector.op('@@')(ts_query), model.name.op('%')(search_term))
+    ).order_by(rank.desc(), model.id)
+
+
+def _sqlite_search(query, model, terms):
+    fts_name = f'{model.__tablename__}_fts'
+    fts = table(fts_name, column('rowid'))
+    match = ' '.join('"{}"*'.format(term) for term in terms)
+    # bm25() cannot share a select with window functions, so rank the
+    # matches in a subquery first.
+    matches = db.session.query(
+        fts.c.rowid.label('id'),
+        func.bm25(literal_column(fts_name)).label('rank')
+        ).filter(
+            literal_column(fts_name).op('MATCH')(match)
+        ).subquery()
+    return query.join(
+        matches, matches.c.id == model.id
+    ).order_by(matches.c.rank, model.id)
+
+
+def _prefix_search(query, model, terms):
+    for term in terms:
+        query = query.filter(or_(
+            model.name.ilike(f'{term}%'),
+            model.city.ilike(f'{term}%'),
+            cast(model.genres, String).ilike(f'%{term}%')
+        ))
+    return query.order_by(model.name, model.id)
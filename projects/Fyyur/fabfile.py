@@ -6,8 +6,12 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
+        # The regression tests, then a smoke run of every route on a small
+        # SQLite dataset, which fails on any 5xx
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest -q tests && "
+            "python benchmarks/routes.py --venues 100 --artists 300 --shows 5000 "
+            "--requests 3 --output benchmarks/last_run.json", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
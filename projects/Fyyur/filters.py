@@ -0,0 +1,33 @@
+from datetime import datetime
+from functools import lru_cache
+
+import babel
+import babel.dates
+import dateutil.parser
+
+#---#FILTERS#---#
+
+# Named formats accepted by the `datetime` template filter.
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def datetime_formatter(format, locale):
+    '''
+    Compiled babel pattern for a (format, locale) pair. Parsing the pattern
+    and the locale is most of the cost of babel.dates.format_datetime, so
+    it is done once per pair instead of once per value.
+    '''
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+    locale = babel.Locale.parse(locale)
+    return lambda value: pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale=None):
+    # Routes pass datetimes straight from the database; strings still work.
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value)
+    return datetime_formatter(format, locale or babel.dates.LC_TIME)(value)
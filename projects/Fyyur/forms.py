@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, InputRequired, AnyOf, URL
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -12,7 +12,8 @@ class ShowForm(Form):
     )
     start_time = DateTimeField(
         'start_time',
-        validators=[DataRequired()],
+        # InputRequired keeps the parse error, DataRequired would replace it
+        validators=[InputRequired()],
         default= datetime.today()
     )
 
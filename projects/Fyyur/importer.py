@@ -0,0 +1,270 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+from wtforms import BooleanField
+
+from forms import VenueForm, ArtistForm, ShowForm
+from database.models import Artist, Venue, Show, db
+from database import areas, counters
+
+#---#BULK IMPORT#---#
+
+'''
+Bulk loading of venues, artists and shows from CSV or NDJSON files.
+
+Rows are validated with the same forms the create pages use, then written
+in batches: COPY on Postgres, executemany everywhere else. Each batch
+commits on its own and advances a checkpoint file, so an interrupted
+import picks up after the last committed batch. Rejected rows go to an
+NDJSON error report, one line per row with its batch, line and errors.
+'''
+
+# kind: (form, model, {form field: model column} where they differ)
+KINDS = {
+    'venues': (VenueForm, Venue, {'website_link': 'website'}),
+    'artists': (ArtistForm, Artist, {'website_link': 'website'}),
+    'shows': (ShowForm, Show, {}),
+}
+
+
+def read_rows(path):
+    '''
+    Yields (line number, row dict) from a .csv file with a header or from
+    an NDJSON file (.ndjson, .jsonl, .json). CSV genres are separated by
+    semicolons.
+    '''
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                if row.get('genres'):
+                    row['genres'] = [genre.strip() for genre in row['genres'].split(';')]
+                yield line, row
+        else:
+            for line, text in enumerate(file, start=1):
+                if text.strip():
+                    yield line, json.loads(text)
+
+
+FALSE_STRINGS = {'', '0', 'f', 'false', 'n', 'no', 'off'}
+
+
+def boolean_fields(form_class):
+    return {
+        name for name in dir(form_class)
+        if getattr(getattr(form_class, name), 'field_class', None) is BooleanField
+    }
+
+
+def parse_booleans(form_class, row):
+    '''
+    CSV cells are strings, so 'False' would count as checked; they become
+    bools here.
+    '''
+    booleans = boolean_fields(form_class)
+    return {
+        field: value.strip().lower() not in FALSE_STRINGS
+        if field in booleans and isinstance(value, str) else value
+        for field, value in row.items()
+    }
+
+
+def formdata(row):
+    data = MultiDict()
+    for field, value in row.items():
+        if value is None:
+            continue
+        if isinstance(value, list):
+            data.setlist(field, [str(item) for item in value])
+        elif isinstance(value, bool):
+            # BooleanField reads any non-empty value as checked
+            if value:
+                data.add(field, 'y')
+        else:
+            data.add(field, str(value))
+    return data
+
+
+def validate(kind, row):
+    '''
+    Returns (values for the model table, None) or (None, form errors).
+    '''
+    form_class, model, renames = KINDS[kind]
+    form = form_class(formdata=formdata(parse_booleans(form_class, row)), meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+
+    values = {renames.get(name, name): value for name, value in form.data.items()}
+    if kind == 'shows':
+        try:
+            values['artist_id'] = int(values['artist_id'])
+            values['venue_id'] = int(values['venue_id'])
+        except (TypeError, ValueError):
+            return None, {'artist_id/venue_id': ['Must be numeric ids.']}
+    if row.get('id') not in (None, ''):
+        values['id'] = int(row['id'])
+    return values, None
+
+
+def check_references(connection, valid):
+    '''
+    Splits validated (key, values) show rows into the ones whose artist and
+    venue exist and (key, errors) rejections, with one IN query per table
+    for the whole batch.
+    '''
+    missing = {}
+    for model, column in ((Artist, 'artist_id'), (Venue, 'venue_id')):
+        wanted = {values[column] for key, values in valid}
+        found = {row[0] for row in connection.execute(
+            db.select(model.id).where(model.id.in_(wanted))
+        )} if wanted else set()
+        missing[column] = wanted - found
+
+    kept, rejected = [], []
+    for key, values in valid:
+        problems = {
+            column: ['No such id.'] for column in ('artist_id', 'venue_id')
+            if values[column] in missing[column]
+        }
+        if problems:
+            rejected.append((key, problems))
+        else:
+            kept.append((key, values))
+    return kept, rejected
+
+
+def insert_shows(connection, rows):
+    '''
+    Writes a batch of validated shows and brings the counters of their
+    venues and artists up to date, in the caller's transaction. Core
+    inserts skip the Show mapper events, hence the explicit refresh.
+    '''
+    insert_batch(connection, Show.__table__, rows)
+    counters.refresh_counters(connection, Venue, Venue.id.in_({row['venue_id'] for row in rows}))
+    counters.refresh_counters(connection, Artist, Artist.id.in_({row['artist_id'] for row in rows}))
+
+
+def copy_literal(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value
+        ) + '}'
+    return value
+
+
+def insert_batch(connection, table, rows):
+    '''
+    Writes rows in groups that share the same columns, so a row without
+    an id gets the sequence default rather than NULL.
+    '''
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for columns, group in groups.items():
+        if connection.dialect.name == 'postgresql':
+            copy_rows(connection, table, columns, group)
+        else:
+            connection.execute(table.insert(), group)
+
+
+def copy_rows(connection, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_literal(row[column]) for column in columns])
+    statement = f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+    with connection.connection.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as file:
+            return json.load(file)['line']
+    return 0
+
+
+def save_checkpoint(path, line):
+    temp = path + '.tmp'
+    with open(temp, 'w') as file:
+        json.dump({'line': line}, file)
+    os.replace(temp, path)
+
+
+def import_file(kind, path, batch_size=5000, checkpoint=None, errors=None, restart=False,
+                on_batch=None, log=print):
+    '''
+    Imports `path` into the `kind` table. Returns a summary dict.
+    `on_batch(kind, rows)` is called after each committed batch.
+    '''
+    form_class, model, renames = KINDS[kind]
+    checkpoint = checkpoint or path + '.checkpoint'
+    errors = errors or path + '.errors.ndjson'
+    done = 0 if restart else load_checkpoint(checkpoint)
+    summary = {'inserted': 0, 'rejected': 0, 'batches': 0, 'resumed_after_line': done}
+
+    rows = ((line, row) for line, row in read_rows(path) if line > done)
+    with open(errors, 'w' if restart or not done else 'a') as report:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            summary['batches'] += 1
+            number = summary['batches']
+
+            valid, rejected = [], []
+            for line, row in batch:
+                values, problems = validate(kind, row)
+                if problems:
+                    rejected.append((line, problems))
+                else:
+                    valid.append((line, values))
+
+            with db.engine.begin() as connection:
+                if kind == 'shows' and valid:
+                    valid, missing = check_references(connection, valid)
+                    rejected.extend(missing)
+
+                inserted = [values for line, values in valid]
+                if inserted and kind == 'shows':
+                    insert_shows(connection, inserted)
+                elif inserted:
+                    insert_batch(connection, model.__table__, inserted)
+                    if kind == 'venues':
+                        areas.mark_areas(connection, {(row['state'], row['city']) for row in inserted})
+
+            for line, problems in sorted(rejected, key=lambda rejection: rejection[0]):
+                report.write(json.dumps({'batch': number, 'line': line, 'errors': problems}) + '\n')
+            report.flush()
+            save_checkpoint(checkpoint, batch[-1][0])
+
+            summary['inserted'] += len(inserted)
+            summary['rejected'] += len(rejected)
+            log(f'batch {number} (lines {batch[0][0]}-{batch[-1][0]}): '
+                f'{len(inserted)} inserted, {len(rejected)} rejected')
+            if on_batch and inserted:
+                on_batch(kind, inserted)
+
+    if db.engine.dialect.name == 'postgresql':
+        # explicit ids in the file leave the id sequence behind
+        with db.engine.begin() as connection:
+            connection.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+                f"coalesce((SELECT max(id) FROM {model.__tablename__}), 1))"
+            ))
+
+    return summary
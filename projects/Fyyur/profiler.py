@@ -0,0 +1,135 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+#---#SQL PROFILER#---#
+
+'''
+Opt-in per-request SQL profiler (SQL_PROFILER_ENABLED).
+
+Counts the statements each request runs and the time spent in them, and
+groups them by shape (the SQL text with literals and IN lists collapsed).
+A shape run more than SQL_PROFILER_REPEAT_THRESHOLD times in one request
+is logged as a likely N+1. The totals are sent back in a Server-Timing
+header, and the slowest requests are kept for /_internal/sql.
+
+Streamed responses run part of their queries after the headers are sent;
+those still count towards the slowest requests but not the header.
+'''
+
+logger = logging.getLogger('fyyur.sql')
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PARAMETER_LISTS = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    shape = LITERALS.sub('?', statement)
+    shape = PARAMETER_LISTS.sub('(?)', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+class SQLProfiler:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slowest = []
+        self.keep = 50
+        self.repeat_threshold = 10
+
+    def init_app(self, app, *engines):
+        if not app.config['SQL_PROFILER_ENABLED']:
+            return
+        self.keep = app.config['SQL_PROFILER_KEEP']
+        self.repeat_threshold = app.config['SQL_PROFILER_REPEAT_THRESHOLD']
+
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        app.before_request(self.start_request)
+        app.after_request(self.add_server_timing)
+        app.teardown_request(self.finish_request)
+
+    # The start time lives on the statement's execution context, so a
+    # statement that fails leaves nothing behind on the pooled connection.
+
+    def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if has_request_context() and context is not None:
+            context.profiler_start = time.perf_counter()
+
+    def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        start = getattr(context, 'profiler_start', None)
+        if not has_request_context() or start is None:
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if 'sql_profile' in g:
+            profile = g.sql_profile
+            profile['queries'] += 1
+            profile['db_ms'] += elapsed_ms
+            profile['shapes'][statement_shape(statement)] += 1
+
+    def start_request(self):
+        g.sql_profile = {
+            'queries': 0,
+            'db_ms': 0.0,
+            'shapes': Counter(),
+            'warned': {},
+            'start': time.perf_counter(),
+        }
+
+    def add_server_timing(self, response):
+        profile = g.get('sql_profile')
+        if profile is not None:
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={profile["db_ms"]:.2f};desc="{profile["queries"]} queries"'
+            )
+        return response
+
+    def finish_request(self, error=None):
+        # Runs once after the view and, for streamed responses, once more
+        # when the stream is done: the second run replaces the first record.
+        profile = g.get('sql_profile')
+        if profile is None:
+            return
+        total_ms = (time.perf_counter() - profile['start']) * 1000
+        repeated = [
+            {'statement': shape, 'count': count}
+            for shape, count in profile['shapes'].most_common()
+            if count > self.repeat_threshold
+        ]
+        for item in repeated:
+            if profile['warned'].get(item['statement']) != item['count']:
+                profile['warned'][item['statement']] = item['count']
+                logger.warning('possible N+1 in %s %s: ran %d times: %s',
+                               request.method, request.path, item['count'], item['statement'])
+
+        record = {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(profile['db_ms'], 2),
+            'queries': profile['queries'],
+            'repeated': repeated,
+        }
+        with self.lock:
+            if profile.get('record') is not None:
+                self.slowest = [entry for entry in self.slowest if entry[2] is not profile['record']]
+                heapq.heapify(self.slowest)
+            profile['record'] = record
+            entry = (total_ms, id(record), record)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif total_ms > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def report(self):
+        with self.lock:
+            return [entry[2] for entry in sorted(self.slowest, key=lambda entry: entry[0], reverse=True)]
@@ -0,0 +1,37 @@
+'''
+The tests share one app, set up here before anything imports it: a
+primary and a replica database, both SQLite files, and no page cache.
+'''
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+DATA_DIR = tempfile.mkdtemp()
+PRIMARY_PATH = os.path.join(DATA_DIR, 'primary.db')
+REPLICA_PATH = os.path.join(DATA_DIR, 'replica.db')
+
+# config.py reads the environment on import, so this goes first.
+os.environ['DATABASE_URL'] = 'sqlite:///' + PRIMARY_PATH
+os.environ['DATABASE_REPLICA_URLS'] = 'sqlite:///' + REPLICA_PATH
+os.environ['PAGE_CACHE_TTL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def replicate():
+    '''
+    Returns a function that brings the replica up to date with the
+    primary, like a replica that caught up.
+    '''
+    from app import app
+    from database.models import db
+
+    def copy():
+        with app.app_context():
+            db.engines['replica_0'].dispose()
+        shutil.copyfile(PRIMARY_PATH, REPLICA_PATH)
+
+    return copy
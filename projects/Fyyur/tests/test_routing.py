@@ -0,0 +1,96 @@
+'''
+Read replica routing with the primary and the replica on two SQLite
+files (see conftest.py).
+'''
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from app import app
+from database.models import Artist, Venue, db
+from database.routing import read_from_primary, replicas
+
+
+def next_week():
+    return (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+@pytest.fixture
+def venue_id(replicate):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        venue = Venue(name='Venue', city='Austin', state='TX', genres=['Jazz'])
+        db.session.add_all([venue, Artist(name='Band', city='Austin', state='TX', genres=['Jazz'])])
+        db.session.commit()
+        venue_id = venue.id
+        db.session.remove()
+    replicate()
+    replicas.down_until.clear()
+    return venue_id
+
+
+@pytest.fixture
+def used():
+    '''
+    The binds ('primary' or the replica's key) of the statements run while
+    the test runs, in order.
+    '''
+    binds = []
+    with app.app_context():
+        engines = {key or 'primary': engine for key, engine in db.engines.items()}
+    listeners = {
+        key: lambda *args, key=key: binds.append(key)
+        for key in engines
+    }
+    for key, engine in engines.items():
+        event.listen(engine, 'before_cursor_execute', listeners[key])
+    yield binds
+    for key, engine in engines.items():
+        event.remove(engine, 'before_cursor_execute', listeners[key])
+
+
+def test_gets_read_from_the_replica(venue_id, used):
+    assert app.test_client().get('/artists').status_code == 200
+    assert app.test_client().post('/venues/search', data={'search_term': 'Venue'}).status_code == 200
+    assert used and set(used) == {'replica_0'}
+
+
+def test_writes_use_the_primary(venue_id, used):
+    response = app.test_client().post('/shows/batch', json={'shows': [
+        {'artist_id': 1, 'venue_id': venue_id, 'start_time': next_week()}
+    ]})
+    assert response.status_code == 201
+    assert used and set(used) == {'primary'}
+
+
+def test_read_from_primary_switches_the_request(venue_id, used):
+    with app.test_request_context('/artists'):
+        replicas.route_request()
+        assert db.session.get_bind() is db.engines['replica_0']
+        read_from_primary()
+        assert db.session.get_bind() is db.engines[None]
+        assert g.db_route == 'primary'
+
+    # the venue page is stored in the page cache, so it is built from the primary
+    assert app.test_client().get(f'/venues/{venue_id}').status_code == 200
+    assert used and set(used) == {'primary'}
+
+
+def test_reads_right_after_a_write_use_the_primary(venue_id, used):
+    writer = app.test_client()
+    response = writer.post('/shows/batch', json={'shows': [
+        {'artist_id': 1, 'venue_id': venue_id, 'start_time': next_week()}
+    ]})
+    assert response.status_code == 201
+
+    used.clear()
+    writer.get('/artists')
+    assert used and set(used) == {'primary'}
+
+    # other clients keep reading from the replica
+    used.clear()
+    app.test_client().get('/artists')
+    assert used and set(used) == {'replica_0'}
@@ -0,0 +1,93 @@
+'''
+The venues listing must cost the same number of SQL statements however
+many venues there are (no query per area or per venue).
+'''
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import app, area_summary
+from database import counters
+from database.areas import rebuild_areas
+from database.models import Artist, Show, Venue, db
+
+
+def seed(venues):
+    now = datetime.now()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        artist = Artist(name='Band', city='City 0', state='NY', genres=['Jazz'])
+        db.session.add(artist)
+        for i in range(venues):
+            venue = Venue(name=f'Venue {i}', city=f'City {i % 7}', state=('NY', 'CA', 'TX')[i % 3], genres=['Jazz'])
+            db.session.add(venue)
+            db.session.flush()
+            db.session.add_all([
+                Show(venue_id=venue.id, artist_id=artist.id, start_time=now + timedelta(days=days))
+                for days in (-2, 3)
+            ])
+        db.session.commit()
+        with db.engine.begin() as connection:
+            counters.reconcile(connection)
+            rebuild_areas(connection)
+        db.session.remove()
+
+
+def venues_statements():
+    statements = []
+    count = lambda *args: statements.append(args[2])
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count)
+    try:
+        # the staleness check runs on every request measured
+        area_summary.checked_at = 0.0
+        response = app.test_client().get('/venues')
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return statements
+
+
+def test_venues_statement_count_is_constant(replicate):
+    seed(5)
+    replicate()
+    few = venues_statements()
+    seed(50)
+    replicate()
+    many = venues_statements()
+    assert len(few) == len(many), many
+
+
+def test_venues_list_the_upcoming_shows_of_each_venue(replicate):
+    now = datetime.now()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        artist = Artist(name='Band', city='Austin', state='TX', genres=['Jazz'])
+        busy = Venue(name='Busy', city='Austin', state='TX', genres=['Jazz'])
+        quiet = Venue(name='Quiet', city='Austin', state='TX', genres=['Jazz'])
+        db.session.add_all([artist, busy, quiet])
+        db.session.flush()
+        # shows added one by one, through the counters' mapper events
+        for venue, days in ((busy, (-3, -1, 1, 2, 30)), (quiet, (-10,))):
+            for day in days:
+                db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=now + timedelta(days=day)))
+                db.session.commit()
+        expected = {busy.id: 3, quiet.id: 0}
+        area_summary.checked_at = 0.0
+        area_summary.ensure_fresh()
+        db.session.remove()
+    replicate()
+
+    for path in ('/api/v1/venues', '/api/v1/venues?genre=Jazz'):
+        response = app.test_client().get(path)
+        assert response.status_code == 200
+        listed = {
+            venue['id']: venue['num_upcoming_shows']
+            for area in response.get_json()['areas'] for venue in area['venues']
+        }
+        assert listed == expected, path